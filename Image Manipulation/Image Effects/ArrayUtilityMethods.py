@@ -0,0 +1,223 @@
+import numpy as np
+from PIL import Image
+from collections import OrderedDict, namedtuple
+import ImageUtilityMethods as util
+import LookupTables as lut
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "fields", "currentBytes", "maxBytes"])
+
+class DistanceFieldCache():
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.currentBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.fields = OrderedDict()
+
+    def cacheInfo(self):
+        return CacheInfo(self.hits, self.misses, len(self.fields), self.currentBytes, self.maxBytes)
+
+    def clear(self):
+        self.fields.clear()
+        self.currentBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def getField(self, size, order, offset):
+        key = (tuple(size), order, tuple(offset))
+        field = self.fields.get(key)
+
+        if field is not None:
+            self.hits += 1
+            self.fields.move_to_end(key)
+            return field
+
+        self.misses += 1
+        field = getRelativeDistanceField(size, order, offset)
+
+        # A field larger than the whole budget is returned without being cached
+        if field.nbytes <= self.maxBytes:
+            self.fields[key] = field
+            self.currentBytes += field.nbytes
+
+            while self.currentBytes > self.maxBytes:
+                (_, evicted) = self.fields.popitem(last = False)
+                self.currentBytes -= evicted.nbytes
+
+        return field
+
+# Fields take 8 bytes per pixel, so this holds sixteen 4 MP fields or four 16 MP ones
+vignetteCache = DistanceFieldCache(maxBytes = 512 * 1024 * 1024)
+
+# Rows of the image widened at a time by pixelate
+pixelationBandRows = 64
+
+def addMultitoneNoise(arr, noiseLevel, seed = None, strip = None):
+    level = np.asarray(noiseLevel, dtype = np.int16)
+    noise = getNoiseGenerator(seed, strip).integers(-level, level, size = arr.shape, dtype = np.int16, endpoint = True)
+    return np.clip(arr + noise, 0, 255).astype(np.uint8)
+
+def addSingletoneNoise(arr, noiseLevel, seed = None, strip = None):
+    noise = getNoiseGenerator(seed, strip).integers(-noiseLevel, noiseLevel, size = arr.shape[:2] + (1,), dtype = np.int16, endpoint = True)
+    return np.clip(arr + noise, 0, 255).astype(np.uint8)
+
+def arrayToImage(arr):
+    return Image.fromarray(arr, "RGB")
+
+def blur(arr, blurDegree):
+    (height, width, channels) = arr.shape
+
+    # Largest partial sum seen by either pass, used to pick the narrowest safe accumulator
+    maxSum = 255 * max(height, min(height, 2 * blurDegree + 1) * width)
+    sumType = np.int32 if maxSum < 2 ** 31 else np.int64
+
+    # One channel at a time, both passes share a running sum buffer with a zero first row and column
+    cumSums = np.zeros((height + 1, width + 1), dtype = sumType)
+    blockSums = np.empty((height, width), dtype = sumType)
+    rowCounts = getWindowCounts(height, blurDegree)[:, np.newaxis]
+    colCounts = getWindowCounts(width, blurDegree)[np.newaxis, :]
+    result = np.empty_like(arr)
+
+    for channel in range(channels):
+        np.cumsum(arr[:, :, channel], axis = 0, dtype = sumType, out = cumSums[1:, 1:])
+        getWindowSums(cumSums[:, 1:], blurDegree, blockSums, 0)
+        np.cumsum(blockSums, axis = 1, out = cumSums[1:, 1:])
+        getWindowSums(cumSums[1:], blurDegree, blockSums, 1)
+
+        # Dividing by the height and then the width of the window floors the same as dividing by its area
+        np.floor_divide(blockSums, rowCounts, out = blockSums)
+        np.floor_divide(blockSums, colCounts, out = blockSums)
+        result[:, :, channel] = blockSums
+
+    return result
+
+def getBlockSizes(length, blockSize):
+    starts = np.arange(0, length, blockSize)
+    return (starts, np.diff(np.append(starts, length)))
+
+def getGrayscaleArrayFunc(mode):
+    mode = mode.strip().upper()
+
+    if mode == "AVG":
+        return lambda arr : (arr.sum(axis = 2, dtype = np.uint16) // arr.shape[2]).astype(np.uint8)
+    elif mode == "MAX":
+        return lambda arr : arr.max(axis = 2)
+    elif mode == "MEDIAN":
+        return lambda arr : np.sort(arr, axis = 2)[:, :, 1]
+    elif mode == "MIN":
+        return lambda arr : arr.min(axis = 2)
+    else:
+        raise ValueError("Invalid value of 'mode' variable. The accepted values are: 'AVG', 'MAX', 'MEDIAN' or 'MIN'.")
+
+def getWindowCounts(length, radius):
+    index = np.arange(length)
+    return np.minimum(index + radius + 1, length) - np.maximum(index - radius, 0)
+
+def getWindowSums(cumSums, radius, out, axis):
+    # Running sums with a leading zero, so that each window is the difference of two of its entries
+    cumSums = np.moveaxis(cumSums, axis, 0)
+    out = np.moveaxis(out, axis, 0)
+    length = out.shape[0]
+
+    # Windows clear of both borders are the difference of two shifted views
+    interior = max(length - 2 * radius, 0)
+    start = min(radius, length)
+    np.subtract(cumSums[2 * radius + 1:2 * radius + 1 + interior], cumSums[:interior], out = out[start:start + interior])
+
+    # Only the windows cut short by a border need their bounds clamped
+    edges = np.r_[0:start, start + interior:length]
+    out[edges] = cumSums[np.minimum(edges + radius + 1, length)] - cumSums[np.maximum(edges - radius, 0)]
+
+def getNoiseGenerator(seed = None, strip = None):
+    if strip is None:
+        return np.random.default_rng(seed)
+
+    # Every strip gets its own stream spawned from the seed, so that strips can be processed in any order
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key = (strip.index,)))
+
+def getRelativeDistanceField(size, order, offset, rows = None):
+    centralPt = (size[0]//2, size[1]//2)
+    maxDistance = util.getMaxDistanceFromCentralPt(centralPt, order)
+    (rowStart, rowStop) = rows or (0, size[1])
+
+    xDist = np.abs(centralPt[0] - np.arange(size[0])) + offset[0]
+    yDist = np.abs(centralPt[1] - np.arange(rowStart, rowStop)) + offset[1]
+
+    distance = (yDist.astype(np.float64) ** order)[:, np.newaxis] + (xDist.astype(np.float64) ** order)[np.newaxis, :]
+    # Kept in float64 like the pixel version, so that the blend truncates to the same values
+    np.divide(distance, maxDistance, out = distance)
+    np.minimum(distance, 1, out = distance)
+    distance.setflags(write = False)
+    return distance
+
+def getVignetteArrayFunc(colorCode):
+    colorCode = colorCode.strip().upper()
+
+    if colorCode == 'B' or colorCode == 'BLACK':
+        return lambda channel, relativeDistance, out : np.subtract(channel, np.multiply(relativeDistance, channel, out = out), out = out)
+    elif colorCode == 'W' or colorCode == 'WHITE':
+        return lambda channel, relativeDistance, out : np.add(channel, np.multiply(relativeDistance, np.subtract(255, channel, out = out, dtype = np.float64), out = out), out = out)
+    else:
+        raise ValueError("Invalid value of 'colorCode' variable. The accepted values are: 'B', 'W', 'BLACK', or 'WHITE'.")
+
+def grayscale(arr, mode):
+    gray = getGrayscaleArrayFunc(mode)(arr)
+    return np.repeat(gray[:, :, np.newaxis], 3, axis = 2)
+
+def imageToArray(img):
+    return np.asarray(img.convert("RGB"), dtype = np.uint8)
+
+def invert(arr):
+    return lut.applyLut(arr, lut.invertLuts)
+
+def isolateColorSpectrum(arr, colorSpectrum):
+    return lut.applyLut(arr, lut.getColorSpectrumLuts(colorSpectrum))
+
+def pixelate(arr, pixelation):
+    (height, width) = arr.shape[:2]
+    (yStarts, yCounts) = getBlockSizes(height, pixelation)
+    (xStarts, xCounts) = getBlockSizes(width, pixelation)
+
+    # uint32 holds the sum of any block up to 4104 pixels across
+    sumType = np.uint32 if 255 * pixelation * pixelation < 2 ** 32 else np.uint64
+    blockSums = np.empty((len(yStarts), len(xStarts), arr.shape[2]), dtype = sumType)
+
+    # reduceat sums each block in one pass, including the smaller blocks along the right and bottom edges.
+    # It widens its whole input first, so the rows go through a band of whole blocks at a time
+    blocksPerBand = max(1, pixelationBandRows // pixelation)
+    for i in range(0, len(yStarts), blocksPerBand):
+        bandStarts = yStarts[i:i + blocksPerBand]
+        band = arr[bandStarts[0]:bandStarts[-1] + yCounts[i + len(bandStarts) - 1]]
+        rowSums = np.add.reduceat(band, bandStarts - bandStarts[0], axis = 0, dtype = sumType)
+        blockSums[i:i + len(bandStarts)] = np.add.reduceat(rowSums, xStarts, axis = 1)
+
+    counts = (yCounts[:, np.newaxis] * xCounts[np.newaxis, :])[:, :, np.newaxis]
+    blockColors = (blockSums // counts).astype(np.uint8)
+
+    return np.repeat(np.repeat(blockColors, yCounts, axis = 0), xCounts, axis = 1)
+
+def toneCurve(arr, curve):
+    return lut.applyLut(arr, lut.compileChannelFuncs(curve))
+
+def vignette(arr, colorCode = 'B', order = 2, offset = (0, 0), strip = None):
+    order = int(order)
+    if order < 1:
+        raise ValueError("Invalid value of 'scale' variable. The accepted value is any positive integer.")
+
+    vignetteFunc = getVignetteArrayFunc(colorCode)
+
+    if strip is None:
+        size = (arr.shape[1], arr.shape[0])
+        relativeDistance = vignetteCache.getField(size, order, offset)
+    else:
+        # A strip only needs its own rows of the field, which is computed directly instead of being cached
+        rows = (strip.rowStart, strip.rowStart + arr.shape[0])
+        relativeDistance = getRelativeDistanceField(strip.fullSize, order, offset, rows)
+
+    # Blended one channel at a time through a single float64 buffer, then truncated into the result
+    blended = np.empty(relativeDistance.shape, dtype = np.float64)
+    result = np.empty_like(arr)
+    for channel in range(arr.shape[2]):
+        result[:, :, channel] = vignetteFunc(arr[:, :, channel], relativeDistance, blended)
+
+    return result
@@ -0,0 +1,88 @@
+from PIL import Image
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import ImageEffects as imgEffect
+import ArrayUtilityMethods as arrUtil
+from ImageWriter import saveArray
+import os
+import time
+
+BatchJob = namedtuple("BatchJob", ["originalFile", "specs"])
+JobResult = namedtuple("JobResult", ["job", "megapixels", "seconds", "specSeconds"])
+
+def getImagePixels(originalFile):
+    # Only the header is read here, the image data is decoded by the worker
+    with Image.open(originalFile) as img:
+        return img.size[0] * img.size[1]
+
+def runJob(job):
+    startTime = time.perf_counter()
+
+    # The image is decoded once and shared by every spec of the job
+    originalArr = arrUtil.imageToArray(Image.open(job.originalFile))
+    specSeconds = []
+
+    for spec in job.specs:
+        specStartTime = time.perf_counter()
+        newArr = imgEffect.applyEffectChain(originalArr, spec.steps)
+
+        os.makedirs(os.path.dirname(spec.newFile) or ".", exist_ok = True)
+        saveArray(newArr, spec.newFile, spec.saveOptions)
+        specSeconds.append(time.perf_counter() - specStartTime)
+
+    megapixels = originalArr.shape[0] * originalArr.shape[1] * len(job.specs) / 1_000_000
+    return JobResult(job, megapixels, time.perf_counter() - startTime, specSeconds)
+
+def runBatch(jobs, workers = None, cache = None):
+    startTime = time.perf_counter()
+    workers = workers or os.cpu_count()
+
+    specKeys = {}
+    if cache is not None:
+        pendingJobs = []
+        for job in jobs:
+            pendingSpecs = []
+            for spec in job.specs:
+                specKeys[spec.newFile] = cache.getKey(job.originalFile, spec)
+                if specKeys[spec.newFile] is not None and cache.fetch(specKeys[spec.newFile], spec.newFile):
+                    print(f"Skipped {spec.newFile}. Found in cache.")
+                else:
+                    pendingSpecs.append(spec)
+
+            if pendingSpecs:
+                pendingJobs.append(BatchJob(job.originalFile, pendingSpecs))
+        jobs = pendingJobs
+
+    # With fewer images than workers, the specs of each image are split over several jobs so that no worker is left idle
+    chunks = max(1, workers // len(jobs)) if jobs else 1
+    jobs = [BatchJob(job.originalFile, job.specs[i::chunks]) for job in jobs for i in range(min(chunks, len(job.specs)))]
+
+    # Largest images go first so that a big photo is never the last job left running
+    imagePixels = {f: getImagePixels(f) for f in set(job.originalFile for job in jobs)}
+    jobs = sorted(jobs, key = lambda job : (imagePixels[job.originalFile], len(job.specs)), reverse = True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(runJob, job) for job in jobs]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            for (spec, seconds) in zip(result.job.specs, result.specSeconds):
+                if specKeys.get(spec.newFile) is not None:
+                    cache.store(specKeys[spec.newFile], spec.newFile, seconds)
+                print(f"Added {spec.newFile}. Took {round(seconds, 2)}s.")
+
+            print(f"Finished {result.job.originalFile}. Took {round(result.seconds, 2)}s ({round(result.megapixels / result.seconds, 2)} MP/s).")
+
+    totalTime = time.perf_counter() - startTime
+    totalMegapixels = sum(result.megapixels for result in results)
+    print(f"Finished {len(results)} jobs on {workers} workers. Took {round(totalTime, 2)}s ({round(totalMegapixels / totalTime, 2)} MP/s).")
+
+    if cache is not None:
+        cache.save()
+        stats = cache.stats()
+        print(f"Cache hits: {stats.hits}, misses: {stats.misses}, time saved: {round(stats.secondsSaved, 2)}s, size: {round(stats.currentBytes / 2 ** 20, 2)} MB.")
+
+    return results
@@ -0,0 +1,152 @@
+from PIL import Image
+from io import BytesIO
+import ImageEffects as imgEffect
+import ArrayUtilityMethods as arrUtil
+import numpy as np
+import PIL
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+megapixelSizes = [0.25, 1, 4, 16]
+
+def gammaCurve(tone):
+    return round(255 * (tone / 255) ** 0.5)
+
+effectSweeps = [
+    (imgEffect.addMultitoneNoise, [((25, 50, 75), 0)]),
+    (imgEffect.addSingletoneNoise, [(50, 0)]),
+    (imgEffect.blur, [(1,), (3,), (5,), (25,), (100,)]),
+    (imgEffect.grayscale, [('AVG',), ('MAX',), ('MEDIAN',), ('MIN',)]),
+    (imgEffect.invert, [()]),
+    (imgEffect.isolateColorSpectrum, [('R',)]),
+    (imgEffect.pixelate, [(5,), (10,), (25,), (100,)]),
+    (imgEffect.toneCurve, [(gammaCurve,)]),
+    (imgEffect.vignette, [('B', 2, (0, 0)), ('B', 3, (0, 0)), ('W', 5, (100, 100))])
+]
+
+def getSyntheticImage(megapixels, seed = 0):
+    # 4:3 image with smooth gradients and some noise, so that it encodes like a photo rather than flat color
+    width = int(round((megapixels * 1_000_000 * 4 / 3) ** 0.5))
+    height = int(round(width * 3 / 4))
+
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 255, height, dtype = np.float32)[:, np.newaxis]
+    x = np.linspace(0, 255, width, dtype = np.float32)[np.newaxis, :]
+    arr = rng.normal(0, 12, size = (height, width, 3)).astype(np.float32)
+    arr[:, :, 0] += (x + y) / 2
+    arr[:, :, 1] += 255 - x
+    arr[:, :, 2] += y
+
+    return np.clip(arr, 0, 255).astype(np.uint8)
+
+def describeArgs(args):
+    # Functions are given by name, as their repr holds a memory address that changes from run to run
+    return repr(tuple(arg.__name__ if callable(arg) else arg for arg in args))
+
+def encodeImage(arr, fmt):
+    buffer = BytesIO()
+    arrUtil.arrayToImage(arr).save(buffer, format = fmt)
+    return buffer.getvalue()
+
+def runCase(effect, args, encodedImage, fmt, repeat):
+    (decodeTimes, computeTimes, encodeTimes) = ([], [], [])
+    peakBytes = 0
+
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        originalArr = arrUtil.imageToArray(Image.open(BytesIO(encodedImage)))
+        decodeTimes.append(time.perf_counter() - startTime)
+
+        # Every repeat starts with an empty vignette cache, so that the time and the peak memory both come from building the distance field
+        arrUtil.vignetteCache.clear()
+
+        tracemalloc.start()
+        startTime = time.perf_counter()
+        newArr = effect.applyToArray(originalArr, *args)
+        computeTimes.append(time.perf_counter() - startTime)
+        peakBytes = max(peakBytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        startTime = time.perf_counter()
+        encodeImage(newArr, fmt)
+        encodeTimes.append(time.perf_counter() - startTime)
+
+    megapixels = originalArr.shape[0] * originalArr.shape[1] / 1_000_000
+    (decodeTime, computeTime, encodeTime) = (min(decodeTimes), min(computeTimes), min(encodeTimes))
+
+    return {
+        "effect": effect.__name__,
+        "args": describeArgs(args),
+        "width": originalArr.shape[1],
+        "height": originalArr.shape[0],
+        "megapixels": round(megapixels, 3),
+        "decodeSeconds": decodeTime,
+        "computeSeconds": computeTime,
+        "encodeSeconds": encodeTime,
+        "computeMegapixelsPerSecond": megapixels / computeTime,
+        "totalMegapixelsPerSecond": megapixels / (decodeTime + computeTime + encodeTime),
+        "peakComputeBytes": peakBytes
+    }
+
+def runBenchmarks(sizes = megapixelSizes, effectNames = None, fmt = "JPEG", repeat = 3):
+    results = []
+
+    for megapixels in sizes:
+        encodedImage = encodeImage(getSyntheticImage(megapixels), fmt)
+
+        for (effect, sweep) in effectSweeps:
+            if effectNames and effect.__name__ not in effectNames:
+                continue
+
+            for args in sweep:
+                result = runCase(effect, args, encodedImage, fmt, repeat)
+                results.append(result)
+                print(f"{result['effect']:<20} {result['args']:<24} {megapixels:>6} MP | "
+                      f"decode {result['decodeSeconds']:.3f}s compute {result['computeSeconds']:.3f}s encode {result['encodeSeconds']:.3f}s | "
+                      f"{result['computeMegapixelsPerSecond']:8.1f} MP/s | peak {result['peakComputeBytes'] / 2 ** 20:.1f} MB")
+
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "format": fmt,
+            "repeat": repeat
+        },
+        "results": results
+    }
+
+def compareResults(baseline, current):
+    key = lambda result : (result["effect"], result["args"], result["megapixels"])
+    baselineResults = {key(result): result for result in baseline["results"]}
+
+    for result in current["results"]:
+        old = baselineResults.get(key(result))
+        if old is not None:
+            speedup = old["computeSeconds"] / result["computeSeconds"]
+            print(f"{result['effect']:<20} {result['args']:<24} {result['megapixels']:>6} MP | compute speedup {speedup:6.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the Image Effects on synthetic images.")
+    parser.add_argument("--sizes", type = float, nargs = "+", default = megapixelSizes, help = "Image sizes in megapixels")
+    parser.add_argument("--effects", nargs = "+", help = "Names of the effects to benchmark, all of them by default")
+    parser.add_argument("--format", default = "JPEG", help = "Format used to encode and decode the images")
+    parser.add_argument("--repeat", type = int, default = 3, help = "Number of runs per case, the fastest is reported")
+    parser.add_argument("--output", default = "benchmark_results.json", help = "Path of the JSON file to write the results to")
+    parser.add_argument("--compare", help = "Path of an earlier JSON results file to compare against")
+    cmdArgs = parser.parse_args()
+
+    report = runBenchmarks(cmdArgs.sizes, cmdArgs.effects, cmdArgs.format, cmdArgs.repeat)
+
+    with open(cmdArgs.output, "w") as f:
+        json.dump(report, f, indent = 2)
+    print(f"\nSaved results to {cmdArgs.output}")
+
+    if cmdArgs.compare:
+        with open(cmdArgs.compare) as f:
+            compareResults(json.load(f), report)
@@ -1,14 +1,29 @@
 from PIL import Image
 from random import randint
+from functools import wraps
+from collections import namedtuple
 import ImageUtilityMethods as util
+import ArrayUtilityMethods as arrUtil
+from ImageWriter import BackgroundWriter, saveArray
 import time
 
-def imageEffect(effect_func):
+EffectStep = namedtuple("EffectStep", ["effect", "args"])
+EffectSpec = namedtuple("EffectSpec", ["newFile", "steps", "saveOptions"], defaults = [None])
 
-    def applyEffectAndSave(originalFile, newFile, *args):
-        startTime = time.time()
+def imageEffect(effect_func = None, arrayFunc = None, version = 1, isRandom = False):
+    if effect_func is None:
+        return lambda func : imageEffect(func, arrayFunc, version, isRandom)
+
+    def applyToArray(arr, *args, useArray = None):
+        if useArray is None:
+            useArray = arrayFunc is not None
+        elif useArray and arrayFunc is None:
+            raise ValueError(f"'{effect_func.__name__}' has no array implementation.")
+
+        if useArray:
+            return arrayFunc(arr, *args)
 
-        originalImg = Image.open(originalFile)
+        originalImg = arrUtil.arrayToImage(arr)
         size = originalImg.size
 
         newImg = Image.new("RGB", size, (255, 255, 255))
@@ -17,30 +32,92 @@ def imageEffect(effect_func):
 
         effect_func(pix, size, *args)
 
-        newImg.save(newFile)
+        return arrUtil.imageToArray(newImg)
+
+    @wraps(effect_func)
+    def applyEffectAndSave(originalFile, newFile, *args, useArray = None, writer = None, saveOptions = None):
+        startTime = time.time()
 
-        print(f"Added {newFile}. Took {round(time.time() - startTime, 2)}s.")
+        originalArr = arrUtil.imageToArray(Image.open(originalFile))
+        newArr = applyToArray(originalArr, *args, useArray = useArray)
+
+        if writer is not None:
+            writer.save(newArr, newFile, saveOptions)
+            print(f"Queued {newFile}. Took {round(time.time() - startTime, 2)}s.")
+        else:
+            saveArray(newArr, newFile, saveOptions)
+            print(f"Added {newFile}. Took {round(time.time() - startTime, 2)}s.")
+
+    applyEffectAndSave.applyToArray = applyToArray
+    applyEffectAndSave.pixelFunc = effect_func
+    applyEffectAndSave.arrayFunc = arrayFunc
+    applyEffectAndSave.version = version
+    applyEffectAndSave.isRandom = isRandom
     return applyEffectAndSave
 
-@imageEffect
-def addMultitoneNoise(pix, size, noiseLevel):
-    noiseFunc = util.getNoiseFunc(noiseLevel, False)
+def applyEffectChain(arr, steps, useArray = None):
+    for step in steps:
+        arr = step.effect.applyToArray(arr, *step.args, useArray = useArray)
+    return arr
+
+def applyEffects(originalFile, effectSpecs, useArray = None, cache = None, writer = None):
+    originalArr = None
+    pendingSaves = []
+    ownWriter = writer is None
+    if ownWriter:
+        writer = BackgroundWriter()
+
+    try:
+        for spec in effectSpecs:
+            key = cache.getKey(originalFile, spec, useArray) if cache is not None else None
+            if key is not None and cache.fetch(key, spec.newFile):
+                print(f"Skipped {spec.newFile}. Found in cache.")
+                continue
+
+            # The image is only decoded once the first spec that is not in the cache needs it
+            if originalArr is None:
+                startTime = time.time()
+                originalArr = arrUtil.imageToArray(Image.open(originalFile))
+                print(f"Decoded {originalFile}. Took {round(time.time() - startTime, 2)}s.")
+
+            startTime = time.time()
+
+            # Encoding happens on the writer's threads while the next spec is being computed
+            newArr = applyEffectChain(originalArr, spec.steps, useArray)
+            future = writer.save(newArr, spec.newFile, spec.saveOptions)
+            pendingSaves.append((spec, key, future, time.time() - startTime))
+
+            print(f"Queued {spec.newFile}. Took {round(time.time() - startTime, 2)}s.")
+    finally:
+        if ownWriter:
+            writer.close()
+
+    if cache is not None:
+        for (spec, key, future, seconds) in pendingSaves:
+            future.result()
+            if key is not None:
+                cache.store(key, spec.newFile, seconds)
+        cache.save()
+
+@imageEffect(arrayFunc = arrUtil.addMultitoneNoise, isRandom = True)
+def addMultitoneNoise(pix, size, noiseLevel, seed = None):
+    noiseFunc = util.getNoiseFunc(noiseLevel, False, seed)
     original = pix.original
     
     for x in range(size[0]):
         for y in range(size[1]):
             pix.new[x, y] = noiseFunc(original[x, y])  
 
-@imageEffect
-def addSingletoneNoise(pix, size, noiseLevel):
-    noiseFunc = util.getNoiseFunc(noiseLevel, True)
+@imageEffect(arrayFunc = arrUtil.addSingletoneNoise, isRandom = True)
+def addSingletoneNoise(pix, size, noiseLevel, seed = None):
+    noiseFunc = util.getNoiseFunc(noiseLevel, True, seed)
     original = pix.original
     
     for x in range(size[0]):
         for y in range(size[1]):
             pix.new[x, y] = noiseFunc(original[x, y])    
 
-@imageEffect
+@imageEffect(arrayFunc = arrUtil.blur)
 def blur(pix, size, blurDegree):
     getAvgColor = util.getAvgColor
     getNearbyPixels = util.getNearbyPixels
@@ -51,7 +128,7 @@ def blur(pix, size, blurDegree):
         for y in range(size[1]):
             new[x, y] = getAvgColor(getNearbyPixels(original, x, y, blurDegree, size))
 
-@imageEffect
+@imageEffect(arrayFunc = arrUtil.grayscale)
 def grayscale(pix, size, mode):
     grayscaleFunc = util.getGrayscaleFunc(mode)
 
@@ -59,20 +136,20 @@ def grayscale(pix, size, mode):
         for y in range(size[1]):
             pix.new[x, y] = util.getGrayscaleColorForPixel(pix.original, x, y, grayscaleFunc)
 
-@imageEffect
+@imageEffect(arrayFunc = arrUtil.invert)
 def invert(pix, size):
     for x in range(size[0]):
         for y in range(size[1]):
             pix.new[x, y] = util.getInvertColor(pix.original, x, y)
 
-@imageEffect
+@imageEffect(arrayFunc = arrUtil.isolateColorSpectrum)
 def isolateColorSpectrum(pix, size, colorSpectrum):
     colorIndex = util.getColorSpectrumIndex(colorSpectrum)
     for x in range(size[0]):
         for y in range(size[1]):
             pix.new[x, y] = util.getSingleColorSpectrumForPixel(pix.original, x, y, colorIndex)
 
-@imageEffect
+@imageEffect(arrayFunc = arrUtil.pixelate)
 def pixelate(pix, size, pixelation):
     for y in range(0, size[1], pixelation):
         for x in range(0, size[0], pixelation):
@@ -85,7 +162,16 @@ def pixelate(pix, size, pixelation):
                 for j in range(y, yMax):
                     pix.new[i, j] = pixelColor
 
-@imageEffect
+@imageEffect(arrayFunc = arrUtil.toneCurve)
+def toneCurve(pix, size, curve):
+    toneCurveFunc = util.getToneCurveFunc(curve)
+    original = pix.original
+
+    for x in range(size[0]):
+        for y in range(size[1]):
+            pix.new[x, y] = toneCurveFunc(original[x, y])
+
+@imageEffect(arrayFunc = arrUtil.vignette, version = 2)
 def vignette(pix, size, colorCode = 'B', order = 2, offset = (0, 0)):
     order = int(order)
     if order < 1:
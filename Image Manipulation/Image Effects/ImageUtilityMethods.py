@@ -1,4 +1,4 @@
-from random import randint
+from random import Random
 
 class PixelReferenceContainer():
     def __init__(self, original, new):
@@ -68,7 +68,8 @@ def getNearbyPixels(pix, x, y, blockSize, size):
 
     return [pix[i, j] for i in range(xMin, xMax) for j in range(yMin, yMax)]
 
-def getNoiseFunc(noiseLevel, isSingleTone):
+def getNoiseFunc(noiseLevel, isSingleTone, seed = None):
+    randint = Random(seed).randint
     singletoneNoise = lambda tone, noise : min(max(tone + noise, 0), 255)
     multitoneNoise = lambda tone, level : min(max(tone + randint(-level, level), 0), 255)
 
@@ -99,6 +100,14 @@ def getSingleColorSpectrumForPixel(pix, x, y, colorIndex):
     color[colorIndex] = pix[x, y][colorIndex]
     return tuple(color)
 
+def getToneCurveFunc(curve):
+    channelFuncs = [curve] * 3 if callable(curve) else curve
+
+    if len(channelFuncs) != 3:
+        raise ValueError("Invalid value of 'curve' variable. The accepted values are a function or a tuple/list of 3 functions.")
+
+    return lambda rgb : tuple(int(channelFunc(tone)) for (channelFunc, tone) in zip(channelFuncs, rgb))
+
 def getVignetteFunc(colorCode):
     blackVignette = lambda rgb, relativeDistance : int(rgb - (relativeDistance * rgb))
     whiteVignette = lambda rgb, relativeDistance : int(rgb + relativeDistance * (255 - rgb))
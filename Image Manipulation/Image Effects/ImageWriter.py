@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+import ArrayUtilityMethods as arrUtil
+import threading
+import time
+
+def saveArray(arr, newFile, saveOptions = None):
+    arrUtil.arrayToImage(arr).save(newFile, **(saveOptions or {}))
+
+class BackgroundWriter():
+    def __init__(self, workers = 2, maxPending = 4):
+        self.pool = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "ImageWriter")
+        # Caps the number of images waiting to be encoded, and so the memory they hold on to
+        self.slots = threading.BoundedSemaphore(maxPending)
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.pool.shutdown(wait = True)
+            self.futures = []
+
+    def encode(self, arr, newFile, saveOptions):
+        startTime = time.time()
+        try:
+            saveArray(arr, newFile, saveOptions)
+        finally:
+            self.slots.release()
+
+        print(f"Saved {newFile}. Took {round(time.time() - startTime, 2)}s.")
+
+    def save(self, arr, newFile, saveOptions = None):
+        self.slots.acquire()
+        future = self.pool.submit(self.encode, arr, newFile, saveOptions)
+        self.futures.append(future)
+        return future
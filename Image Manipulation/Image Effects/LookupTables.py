@@ -0,0 +1,42 @@
+import numpy as np
+import ImageUtilityMethods as util
+
+tones = range(256)
+
+def applyLut(arr, luts):
+    # Each channel value indexes into the LUT of its own channel, all in one pass over the image
+    return luts[np.arange(3), arr]
+
+def compileChannelFuncs(channelFuncs):
+    if callable(channelFuncs):
+        channelFuncs = [channelFuncs] * 3
+    elif len(channelFuncs) != 3:
+        raise ValueError("Invalid value of 'channelFuncs' variable. The accepted values are a function or a tuple/list of 3 functions.")
+
+    return np.array([compileLut(channelFunc) for channelFunc in channelFuncs], dtype = np.uint8)
+
+def compileLut(channelFunc):
+    lut = [int(channelFunc(tone)) for tone in tones]
+
+    if min(lut) < 0 or max(lut) > 255:
+        raise ValueError("Invalid channel function. It must map every value from 0 to 255 to a value in the same range.")
+
+    return np.array(lut, dtype = np.uint8)
+
+def compilePixelFunc(pixelFunc):
+    # Only valid for functions where each output channel depends on nothing but the same input channel
+    gray = np.array([pixelFunc((tone, tone, tone)) for tone in tones], dtype = np.int64)
+
+    if gray.min() < 0 or gray.max() > 255:
+        raise ValueError("Invalid pixel function. It must map every value from 0 to 255 to a value in the same range.")
+
+    return np.ascontiguousarray(gray.T.astype(np.uint8))
+
+def getColorSpectrumLuts(colorSpectrum):
+    colorIndex = util.getColorSpectrumIndex(colorSpectrum)
+    return compilePixelFunc(lambda rgb : util.getSingleColorSpectrumForPixel({(0, 0): rgb}, 0, 0, colorIndex))
+
+def getInvertLuts():
+    return compilePixelFunc(lambda rgb : util.getInvertColor({(0, 0): rgb}, 0, 0))
+
+invertLuts = getInvertLuts()
@@ -1,4 +1,7 @@
 import ImageEffects as imgEffect
+from ImageEffects import EffectSpec, EffectStep
+from BatchRunner import BatchJob, runBatch
+from ResultCache import ResultCache
 import os
 
 blurDegree = [3, 5]
@@ -11,46 +14,58 @@ vignetteOrder = [2, 3]
 vignetteColor = ['B', 'W']
 vignetteOffset = [(0, 0), (100, 100)]
 
-for f in os.listdir('..\Test_Images'):
+baseDir = os.path.dirname(os.path.abspath(__file__))
+testImagesDir = os.path.join(baseDir, "..", "Test_Images")
+resultsDir = os.path.join(baseDir, "Results")
+cacheDir = os.path.join(baseDir, ".effect_cache")
+
+def getEffectSpecs(f):
     fname, fext = os.path.splitext(f)
-    fPath = "..\\Test_Images\\" + f
+    effectSpecs = []
 
     #Blur
     for b in blurDegree:
-        blurFileName = f"Results\\Blur\\{fname}_Blur_{b}{fext}"
-        imgEffect.blur(fPath, blurFileName, b)
+        blurFileName = os.path.join(resultsDir, "Blur", f"{fname}_Blur_{b}{fext}")
+        effectSpecs.append(EffectSpec(blurFileName, [EffectStep(imgEffect.blur, (b,))]))
 
     #ColorSpectrum
     for c in colorSpectrum:
-        colorFileName = f"Results\\ColorSpectrum\\{fname}_ColorSpectrum_{c}{fext}"
-        imgEffect.isolateColorSpectrum(fPath, colorFileName, c)
+        colorFileName = os.path.join(resultsDir, "ColorSpectrum", f"{fname}_ColorSpectrum_{c}{fext}")
+        effectSpecs.append(EffectSpec(colorFileName, [EffectStep(imgEffect.isolateColorSpectrum, (c,))]))
 
     #Grayscale
     for m in grayscaleModes:
-        grayscaleFileName = f"Results\\Grayscale\\{fname}_Grayscale_{m}{fext}"
-        imgEffect.grayscale(fPath, grayscaleFileName, m)
+        grayscaleFileName = os.path.join(resultsDir, "Grayscale", f"{fname}_Grayscale_{m}{fext}")
+        effectSpecs.append(EffectSpec(grayscaleFileName, [EffectStep(imgEffect.grayscale, (m,))]))
 
     #Invert
-    invertFileName = f"Results\\Invert\\{fname}_Invert{fext}"
-    imgEffect.invert(fPath, invertFileName)
+    invertFileName = os.path.join(resultsDir, "Invert", f"{fname}_Invert{fext}")
+    effectSpecs.append(EffectSpec(invertFileName, [EffectStep(imgEffect.invert, ())]))
 
     #Noise
     for n in multiToneNoiseLevel:
-        multiToneNoiseFileName = f"Results\\Noise\\{fname}_Noise_Multi_{n}{fext}"
-        imgEffect.addMultitoneNoise(fPath, multiToneNoiseFileName, n)
+        multiToneNoiseFileName = os.path.join(resultsDir, "Noise", f"{fname}_Noise_Multi_{n}{fext}")
+        effectSpecs.append(EffectSpec(multiToneNoiseFileName, [EffectStep(imgEffect.addMultitoneNoise, (n,))]))
 
     for n in singleToneNoiseLevel:
-        singleToneNoiseFileName = f"Results\\Noise\\{fname}_Noise_Single_{n}{fext}"
-        imgEffect.addSingletoneNoise(fPath, singleToneNoiseFileName, n)
+        singleToneNoiseFileName = os.path.join(resultsDir, "Noise", f"{fname}_Noise_Single_{n}{fext}")
+        effectSpecs.append(EffectSpec(singleToneNoiseFileName, [EffectStep(imgEffect.addSingletoneNoise, (n,))]))
 
     #Pixelate
     for p in pixelation:
-        pixelateFileName = f"Results\\Pixelate\\{fname}_Pixelate_{p}{fext}"
-        imgEffect.pixelate(fPath, pixelateFileName, p)
+        pixelateFileName = os.path.join(resultsDir, "Pixelate", f"{fname}_Pixelate_{p}{fext}")
+        effectSpecs.append(EffectSpec(pixelateFileName, [EffectStep(imgEffect.pixelate, (p,))]))
 
     #Vignette
     for color in vignetteColor:
         for order in vignetteOrder:
             for offset in vignetteOffset:
-                vignetteFileName = f"Results\\Vignette\\{fname}_Vignette_{color}_{order}_{offset}{fext}"
-                imgEffect.vignette(fPath, vignetteFileName, color, order, offset)
\ No newline at end of file
+                vignetteFileName = os.path.join(resultsDir, "Vignette", f"{fname}_Vignette_{color}_{order}_{offset}{fext}")
+                effectSpecs.append(EffectSpec(vignetteFileName, [EffectStep(imgEffect.vignette, (color, order, offset))]))
+
+    return effectSpecs
+
+if __name__ == "__main__":
+    jobs = [BatchJob(os.path.join(testImagesDir, f), getEffectSpecs(f)) for f in os.listdir(testImagesDir)]
+
+    runBatch(jobs, cache = ResultCache(cacheDir))
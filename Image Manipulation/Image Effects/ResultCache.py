@@ -0,0 +1,146 @@
+from collections import OrderedDict, namedtuple
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "secondsSaved", "entries", "currentBytes", "maxBytes"])
+
+def getFileHash(path):
+    fileHash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda : f.read(1024 * 1024), b""):
+            fileHash.update(chunk)
+    return fileHash.hexdigest()
+
+def describeArgs(args):
+    # Functions are named by module and qualified name, as their repr holds a memory address that changes from run to run.
+    # Lambdas and nested functions share their names with others, so None is returned for them and the result is not cached
+    described = []
+    for arg in args:
+        if isinstance(arg, (tuple, list)):
+            description = describeArgs(arg)
+        elif callable(arg):
+            qualname = getattr(arg, "__qualname__", None)
+            description = None if qualname is None or "<" in qualname else f"{arg.__module__}.{qualname}"
+        else:
+            description = repr(arg)
+
+        if description is None:
+            return None
+        described.append(description)
+
+    return "(" + ", ".join(described) + ")"
+
+class ResultCache():
+    def __init__(self, cacheDir, maxBytes = 1024 * 1024 * 1024):
+        self.cacheDir = cacheDir
+        self.objectsDir = os.path.join(cacheDir, "objects")
+        self.indexFile = os.path.join(cacheDir, "index.json")
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self.secondsSaved = 0.0
+        self.inputHashes = {}
+
+        os.makedirs(self.objectsDir, exist_ok = True)
+
+        # The index is kept in least to most recently used order
+        self.entries = OrderedDict()
+        if os.path.exists(self.indexFile):
+            with open(self.indexFile) as f:
+                self.entries = OrderedDict(json.load(f))
+
+        # Objects left outside the index by an interrupted run would never be evicted, so they are removed
+        indexedFiles = set(key + entry["ext"] for (key, entry) in self.entries.items())
+        for objectFile in os.listdir(self.objectsDir):
+            if objectFile not in indexedFiles:
+                os.remove(os.path.join(self.objectsDir, objectFile))
+
+        self.currentBytes = sum(entry["bytes"] for entry in self.entries.values())
+        self.evict()
+
+    def evict(self):
+        while self.currentBytes > self.maxBytes and self.entries:
+            (key, entry) = self.entries.popitem(last = False)
+            self.currentBytes -= entry["bytes"]
+
+            objectFile = self.getObjectFile(key, entry["ext"])
+            if os.path.exists(objectFile):
+                os.remove(objectFile)
+
+    def fetch(self, key, newFile):
+        entry = self.entries.get(key)
+        objectFile = self.getObjectFile(key, entry["ext"]) if entry else None
+
+        if entry is None or not os.path.exists(objectFile):
+            self.misses += 1
+            return False
+
+        # An output that is already up to date is left as it is, a stale or missing one is restored from the cache
+        if not os.path.exists(newFile) or os.path.getsize(newFile) != entry["bytes"] or getFileHash(newFile) != entry["outputHash"]:
+            os.makedirs(os.path.dirname(newFile) or ".", exist_ok = True)
+            shutil.copyfile(objectFile, newFile)
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.secondsSaved += entry["seconds"]
+        return True
+
+    def getInputHash(self, originalFile):
+        fileStat = os.stat(originalFile)
+        statKey = (os.path.abspath(originalFile), fileStat.st_mtime_ns, fileStat.st_size)
+
+        if statKey not in self.inputHashes:
+            self.inputHashes[statKey] = getFileHash(originalFile)
+        return self.inputHashes[statKey]
+
+    def getKey(self, originalFile, spec, useArray = None):
+        # Returns None for results which must not be cached
+        keyHash = hashlib.sha256(self.getInputHash(originalFile).encode())
+
+        for step in spec.steps:
+            # A random effect without a seed is meant to give a different result every run
+            if step.effect.isRandom and inspect.signature(step.effect.pixelFunc).bind(None, None, *step.args).arguments.get("seed") is None:
+                return None
+
+            args = describeArgs(step.args)
+            if args is None:
+                return None
+
+            # The NumPy and pixel by pixel versions do not give the same output for every effect, so the one used is part of the key
+            stepUsesArray = step.effect.arrayFunc is not None if useArray is None else useArray
+            keyHash.update(f"|{step.effect.__name__}:{step.effect.version}:{'array' if stepUsesArray else 'pixel'}:{args}".encode())
+
+        # The output format and encoder options are part of the result, so the same effect saved as JPEG and PNG are different entries
+        keyHash.update(os.path.splitext(spec.newFile)[1].lower().encode())
+        keyHash.update(repr(sorted((spec.saveOptions or {}).items())).encode())
+        return keyHash.hexdigest()
+
+    def getObjectFile(self, key, ext):
+        return os.path.join(self.objectsDir, key + ext)
+
+    def save(self):
+        # Written to a temporary file first, so that an interrupted save never leaves a broken index behind
+        tempFile = self.indexFile + ".tmp"
+        with open(tempFile, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tempFile, self.indexFile)
+
+    def stats(self):
+        return CacheStats(self.hits, self.misses, self.secondsSaved, len(self.entries), self.currentBytes, self.maxBytes)
+
+    def store(self, key, newFile, seconds):
+        ext = os.path.splitext(newFile)[1].lower()
+        fileBytes = os.path.getsize(newFile)
+
+        if key in self.entries:
+            self.currentBytes -= self.entries.pop(key)["bytes"]
+
+        shutil.copyfile(newFile, self.getObjectFile(key, ext))
+        self.entries[key] = {"ext": ext, "bytes": fileBytes, "seconds": seconds, "outputHash": getFileHash(newFile)}
+        self.currentBytes += fileBytes
+
+        self.evict()
+        self.save()
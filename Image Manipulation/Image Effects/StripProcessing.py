@@ -0,0 +1,140 @@
+import numpy as np
+from collections import namedtuple
+import ArrayUtilityMethods as arrUtil
+import os
+import time
+
+StripContext = namedtuple("StripContext", ["fullSize", "rowStart", "index"])
+StripRule = namedtuple("StripRule", ["halo", "align", "usesContext"])
+
+pointRule = lambda *args : StripRule(0, 1, False)
+contextRule = lambda *args : StripRule(0, 1, True)
+
+stripRules = {
+    arrUtil.addMultitoneNoise: contextRule,
+    arrUtil.addSingletoneNoise: contextRule,
+    arrUtil.blur: lambda blurDegree : StripRule(blurDegree, 1, False),
+    arrUtil.grayscale: pointRule,
+    arrUtil.invert: pointRule,
+    arrUtil.isolateColorSpectrum: pointRule,
+    arrUtil.pixelate: lambda pixelation : StripRule(0, pixelation, False),
+    arrUtil.toneCurve: pointRule,
+    arrUtil.vignette: contextRule
+}
+
+class ArrayStrips():
+    def __init__(self, arr):
+        self.arr = arr
+        self.size = (arr.shape[1], arr.shape[0])
+
+    def close(self):
+        if isinstance(self.arr, np.memmap):
+            self.arr.flush()
+
+    def readRows(self, rowStart, rowStop):
+        return np.asarray(self.arr[rowStart:rowStop])
+
+    def writeRows(self, rowStart, rows):
+        self.arr[rowStart:rowStart + rows.shape[0]] = rows
+
+class PpmStrips():
+    def __init__(self, file, size, headerLength):
+        self.file = file
+        self.size = size
+        self.headerLength = headerLength
+        self.rowLength = size[0] * 3
+
+    def close(self):
+        self.file.close()
+
+    def readRows(self, rowStart, rowStop):
+        self.file.seek(self.headerLength + rowStart * self.rowLength)
+        data = self.file.read((rowStop - rowStart) * self.rowLength)
+        return np.frombuffer(data, dtype = np.uint8).reshape((rowStop - rowStart, self.size[0], 3))
+
+    def writeRows(self, rowStart, rows):
+        self.file.seek(self.headerLength + rowStart * self.rowLength)
+        self.file.write(np.ascontiguousarray(rows, dtype = np.uint8).tobytes())
+
+def readPpmHeader(file):
+    fields = []
+    while len(fields) < 4:
+        line = file.readline()
+        if not line:
+            raise ValueError("Invalid PPM file. The header ended before the image size and maximum value.")
+        fields.extend(line.split(b"#")[0].split())
+
+    if fields[0] != b"P6" or int(fields[3]) != 255:
+        raise ValueError("Invalid PPM file. Only binary (P6) files with a maximum value of 255 are supported.")
+
+    return (int(fields[1]), int(fields[2]))
+
+def openStripReader(path):
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".ppm":
+        file = open(path, "rb")
+        size = readPpmHeader(file)
+        return PpmStrips(file, size, file.tell())
+    elif ext == ".npy":
+        return ArrayStrips(np.load(path, mmap_mode = "r"))
+    else:
+        raise ValueError("Invalid file type for strip processing. The accepted file types are: '.ppm' or '.npy'.")
+
+def openStripWriter(path, size):
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".ppm":
+        file = open(path, "w+b")
+        file.write(f"P6\n{size[0]} {size[1]}\n255\n".encode("ascii"))
+        headerLength = file.tell()
+        file.truncate(headerLength + size[0] * size[1] * 3)
+        return PpmStrips(file, size, headerLength)
+    elif ext == ".npy":
+        return ArrayStrips(np.lib.format.open_memmap(path, mode = "w+", dtype = np.uint8, shape = (size[1], size[0], 3)))
+    else:
+        raise ValueError("Invalid file type for strip processing. The accepted file types are: '.ppm' or '.npy'.")
+
+def getStripRule(arrayFunc, args):
+    rule = stripRules.get(arrayFunc)
+    if rule is None:
+        raise ValueError(f"'{arrayFunc.__name__}' does not support strip processing.")
+    return rule(*args)
+
+def processStrips(reader, writer, effect, *args, bandHeight = 256):
+    if effect.arrayFunc is None:
+        raise ValueError(f"'{effect.__name__}' has no array implementation.")
+
+    (width, height) = reader.size
+    rule = getStripRule(effect.arrayFunc, args)
+
+    # Bands start on multiples of the alignment so that blocks line up with those of the whole image
+    bandHeight = max(rule.align, bandHeight // rule.align * rule.align)
+
+    for (index, rowStart) in enumerate(range(0, height, bandHeight)):
+        rowStop = min(height, rowStart + bandHeight)
+        readStart = max(0, rowStart - rule.halo)
+        readStop = min(height, rowStop + rule.halo)
+
+        band = reader.readRows(readStart, readStop)
+
+        if rule.usesContext:
+            newBand = effect.arrayFunc(band, *args, strip = StripContext(reader.size, readStart, index))
+        else:
+            newBand = effect.arrayFunc(band, *args)
+
+        writer.writeRows(rowStart, newBand[rowStart - readStart:rowStop - readStart])
+
+def applyEffectInStrips(originalFile, newFile, effect, *args, bandHeight = 256):
+    startTime = time.time()
+
+    reader = openStripReader(originalFile)
+    writer = openStripWriter(newFile, reader.size)
+
+    try:
+        processStrips(reader, writer, effect, *args, bandHeight = bandHeight)
+    finally:
+        reader.close()
+        writer.close()
+
+    print(f"Added {newFile}. Took {round(time.time() - startTime, 2)}s.")
@@ -0,0 +1,54 @@
+from PIL import GifImagePlugin, Image
+import numpy as np
+
+class StreamingGifWriter():
+    # Writes an animated GIF one frame at a time. Only the previous frame is
+    # kept in memory, and each frame only stores the box that changed since it
+    def __init__(self, path, first_frame, duration = 100, loop = 0, colors = 256):
+        self.duration = duration
+        self.frames = 0
+
+        # A single global palette, taken from the first frame, is reused by all
+        # the frames so none of them needs a local color table
+        self.palette_img = Image.fromarray(first_frame).quantize(colors, dither = Image.Dither.NONE)
+
+        self.fp = open(path, "wb")
+        header, _ = GifImagePlugin.getheader(self.palette_img, info = {"loop": loop, "duration": duration})
+        for block in header:
+            self.fp.write(block)
+
+        self.prev_frame = np.array(first_frame)
+        self.write_region(self.prev_frame, 0, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_frame(self, frame):
+        changed = np.any(frame != self.prev_frame, axis = 2)
+        rows = np.flatnonzero(changed.any(axis = 1))
+        cols = np.flatnonzero(changed.any(axis = 0))
+
+        if len(rows) == 0:
+            # Nothing changed, a single pixel keeps the frame and its delay
+            top, bottom, left, right = 0, 1, 0, 1
+        else:
+            top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+        self.write_region(frame[top:bottom, left:right], left, top)
+        self.prev_frame[top:bottom, left:right] = frame[top:bottom, left:right]
+
+    def close(self):
+        if not self.fp.closed:
+            self.fp.write(b";")
+            self.fp.close()
+
+    def write_region(self, region, left, top):
+        region_img = Image.fromarray(np.ascontiguousarray(region)).quantize(palette = self.palette_img, dither = Image.Dither.NONE)
+
+        # Disposal 1 leaves the previous frame in place under the changed box
+        for block in GifImagePlugin.getdata(region_img, offset = (int(left), int(top)), duration = self.duration, disposal = 1):
+            self.fp.write(block)
+        self.frames += 1
@@ -15,7 +15,10 @@ app = marimo.App(width="medium")
 with app.setup:
     import marimo as mo
     import numpy as np
+    import time
+    from collections import deque
     from PIL import Image
+    from GifWriter import StreamingGifWriter
 
     size = (384, 216)
     num_swaps = 1_000_000
@@ -23,6 +26,10 @@ with app.setup:
     save_every = 250
     disp_mul = 2
     optimal = True
+    batched = True
+    metrics_every = 1_000
+    convergence_window = 50_000
+    min_improvement_rate = 0.05
 
 
 @app.function
@@ -33,39 +40,126 @@ def identify_swap(
     p_c,
     optimal = False
 ):
-    best_improvement, best_i, best_j = 0, 0, 0
-    
-    for i in range(-swap_range, swap_range + 1):
-        for j in range(-swap_range, swap_range + 1):
-    
-    
-            curr_diff = (
-                np.abs(img_2[p_r][p_c] - img_1[p_r][p_c]).sum() +
-                np.abs(img_2[p_r + i][p_c + j] - img_1[p_r + i][p_c + j]).sum()
-            )
-            swap_diff = (
-                np.abs(img_2[p_r + i][p_c + j] - img_1[p_r][p_c]).sum() +
-                np.abs(img_2[p_r][p_c] - img_1[p_r + i][p_c + j]).sum()
-            )
-            
-            improvement = curr_diff - swap_diff
-
-            # print(img_1[p_r][p_c])
-            # print(img_1[p_r + i][p_c + j])
-            # print(img_2[p_r][p_c])
-            # print(img_2[p_r + i][p_c + j])
-            # print(np.abs(img_2[p_r + i][p_c + j] - img_1[p_r][p_c]))
-            # print(np.abs(img_2[p_r][p_c] - img_1[p_r + i][p_c + j]))
-    
-            if improvement > best_improvement:
-                if optimal:
-                    best_improvement = improvement
-                    best_i = i
-                    best_j = j
-                else:
-                    return i, j, improvement
-                
-    return best_i, best_j, best_improvement
+    # Every candidate in the (2 * swap_range + 1) square window around the
+    # pixel is scored at once, window[i + swap_range, j + swap_range] holding
+    # the candidate at offset (i, j)
+    window = np.s_[p_r - swap_range:p_r + swap_range + 1, p_c - swap_range:p_c + swap_range + 1]
+    win_1 = img_1[window]
+    win_2 = img_2[window]
+    px_1 = img_1[p_r, p_c]
+    px_2 = img_2[p_r, p_c]
+
+    curr_diff = np.abs(px_2 - px_1).sum() + np.abs(win_2 - win_1).sum(axis = 2)
+    swap_diff = np.abs(win_2 - px_1).sum(axis = 2) + np.abs(px_2 - win_1).sum(axis = 2)
+    improvement = (curr_diff - swap_diff).ravel()
+
+    # Row-major order matches the order in which the offsets used to be tried,
+    # so argmax keeps the first of equal improvements
+    if optimal:
+        best = np.argmax(improvement)
+    else:
+        best = np.argmax(improvement > 0)
+
+    if improvement[best] <= 0:
+        return 0, 0, 0
+
+    best_i, best_j = divmod(int(best), 2 * swap_range + 1)
+    return best_i - swap_range, best_j - swap_range, improvement[best]
+
+
+@app.function
+def tile_centers(phase_r, phase_c):
+    # Centers spaced one window apart, so that no two windows overlap and all
+    # their swaps can be applied together. The random phase moves the tiling
+    # around between batches, so every pixel gets its turn
+    window = 2 * swap_range + 1
+    rows = np.arange(swap_range + phase_r, size[1] - swap_range, window)
+    cols = np.arange(swap_range + phase_c, size[0] - swap_range, window)
+
+    p_r, p_c = np.meshgrid(rows, cols, indexing = 'ij')
+    return p_r.ravel(), p_c.ravel()
+
+
+@app.function
+def identify_swaps(
+    img_1,
+    img_2,
+    p_r,
+    p_c,
+    optimal = False
+):
+    # Same scoring as identify_swap, for a whole batch of pixels at once
+    offsets = np.arange(-swap_range, swap_range + 1)
+    win_r = p_r[:, np.newaxis] + np.repeat(offsets, len(offsets))
+    win_c = p_c[:, np.newaxis] + np.tile(offsets, len(offsets))
+
+    win_1 = img_1[win_r, win_c]
+    win_2 = img_2[win_r, win_c]
+    px_1 = img_1[p_r, p_c][:, np.newaxis]
+    px_2 = img_2[p_r, p_c][:, np.newaxis]
+
+    curr_diff = np.abs(px_2 - px_1).sum(axis = 2) + np.abs(win_2 - win_1).sum(axis = 2)
+    swap_diff = np.abs(win_2 - px_1).sum(axis = 2) + np.abs(px_2 - win_1).sum(axis = 2)
+    improvement = curr_diff - swap_diff
+
+    if optimal:
+        best = np.argmax(improvement, axis = 1)
+    else:
+        best = np.argmax(improvement > 0, axis = 1)
+
+    best_improvement = np.maximum(improvement[np.arange(len(p_r)), best], 0)
+    best = np.where(best_improvement > 0, best, (len(offsets) ** 2) // 2)
+
+    return offsets[best // len(offsets)], offsets[best % len(offsets)], best_improvement
+
+
+@app.function
+def apply_swaps(img_2, p_r, p_c, swap_i, swap_j):
+    # The windows never overlap, so neither do the swaps
+    curr_px = img_2[p_r, p_c].copy()
+    img_2[p_r, p_c] = img_2[p_r + swap_i, p_c + swap_j]
+    img_2[p_r + swap_i, p_c + swap_j] = curr_px
+
+
+@app.class_definition
+class ObjectiveTracker:
+    # Running L1 distance between img_2 and img_1. A swap lowers it by exactly
+    # its improvement, so it never has to be recomputed from the images
+    def __init__(self, img_1, img_2):
+        self.objective = int(np.abs(img_2 - img_1).sum())
+        self.metrics = []
+        self.recent = deque()
+        self.recent_tried = 0
+        self.recent_improvement = 0
+        self.last_time = time.perf_counter()
+
+    def record_batch(self, tried, accepted, improvement):
+        now = time.perf_counter()
+        self.objective -= improvement
+
+        self.recent.append((tried, improvement))
+        self.recent_tried += tried
+        self.recent_improvement += improvement
+        while self.recent_tried - self.recent[0][0] >= convergence_window:
+            old_tried, old_improvement = self.recent.popleft()
+            self.recent_tried -= old_tried
+            self.recent_improvement -= old_improvement
+
+        self.metrics.append({
+            "objective": self.objective,
+            "tried": tried,
+            "accepted": accepted,
+            "acceptance_rate": accepted / tried,
+            "swaps_per_second": tried / (now - self.last_time)
+        })
+        self.last_time = now
+
+    def converged(self):
+        # Improvement per tried swap over the last convergence_window tries
+        return (
+            self.recent_tried >= convergence_window and
+            self.recent_improvement / self.recent_tried < min_improvement_rate
+        )
 
 
 @app.cell
@@ -90,48 +184,92 @@ def _():
 @app.cell
 def _(img_1, img_2):
     valid_swaps = 0
-    anim_snapshots = [Image.fromarray(img_2.astype('uint8'))]
+    # Swaps only move pixels around, so the palette of the first frame suits
+    # every later one
+    gif_path = "out.gif"
+    gif_writer = StreamingGifWriter(gif_path, img_2.astype('uint8'), duration = 100, loop = 0)
+    tracker = ObjectiveTracker(img_1, img_2)
+
+    if batched:
+        tried_swaps = 0
 
-    rnd_p_r = np.random.randint(swap_range, size[1] - swap_range, size = num_swaps)
-    rnd_p_c = np.random.randint(swap_range, size[0] - swap_range, size = num_swaps)
+        with mo.status.progress_bar(total = num_swaps) as bar:
+            while tried_swaps < num_swaps:
+                phase_r, phase_c = np.random.randint(0, 2 * swap_range + 1, size = 2)
+                p_r, p_c = tile_centers(phase_r, phase_c)
+                p_r, p_c = p_r[:num_swaps - tried_swaps], p_c[:num_swaps - tried_swaps]
 
-    for s_i in mo.status.progress_bar(range(num_swaps)):
-        p_r = rnd_p_r[s_i]
-        p_c = rnd_p_c[s_i]
+                swap_i, swap_j, improvement = identify_swaps(img_1, img_2, p_r, p_c, optimal = optimal)
+                valid = improvement > 0
+                apply_swaps(img_2, p_r[valid], p_c[valid], swap_i[valid], swap_j[valid])
 
-        curr_px = img_2[p_r][p_c].copy()
-        swap_i, swap_j, improvement = identify_swap(img_1, img_2, p_r, p_c, optimal = optimal)
+                # At most one frame per batch, added whenever it crosses a
+                # multiple of save_every
+                if (valid_swaps + valid.sum()) // save_every > valid_swaps // save_every:
+                    gif_writer.add_frame(img_2.astype('uint8'))
 
-        # print(p_r, p_c, curr_px)
-        # print(swap_i, swap_j, improvement)
+                valid_swaps += int(valid.sum())
+                tried_swaps += len(p_r)
+                bar.update(increment = len(p_r))
+
+                tracker.record_batch(len(p_r), int(valid.sum()), int(improvement[valid].sum()))
+                if tracker.converged():
+                    break
+
+    else:
+        rnd_p_r = np.random.randint(swap_range, size[1] - swap_range, size = num_swaps)
+        rnd_p_c = np.random.randint(swap_range, size[0] - swap_range, size = num_swaps)
+
+        batch_tried, batch_accepted, batch_improvement = 0, 0, 0
+
+        for s_i in mo.status.progress_bar(range(num_swaps)):
+            p_r = rnd_p_r[s_i]
+            p_c = rnd_p_c[s_i]
+
+            curr_px = img_2[p_r][p_c].copy()
+            swap_i, swap_j, improvement = identify_swap(img_1, img_2, p_r, p_c, optimal = optimal)
+
+            # print(p_r, p_c, curr_px)
+            # print(swap_i, swap_j, improvement)
     
-        if improvement > 0:
-            valid_swaps += 1
-            img_2[p_r][p_c] = img_2[p_r + swap_i][p_c +  swap_j]
-            img_2[p_r + swap_i][p_c +  swap_j] = curr_px
+            if improvement > 0:
+                valid_swaps += 1
+                batch_accepted += 1
+                batch_improvement += int(improvement)
+                img_2[p_r][p_c] = img_2[p_r + swap_i][p_c +  swap_j]
+                img_2[p_r + swap_i][p_c +  swap_j] = curr_px
 
-            if valid_swaps % save_every == 0:
-                anim_snapshots.append(Image.fromarray(img_2.astype('uint8')))
+                if valid_swaps % save_every == 0:
+                    gif_writer.add_frame(img_2.astype('uint8'))
+
+            # The sequential loop reports its metrics every metrics_every tries
+            batch_tried += 1
+            if batch_tried == metrics_every or s_i == num_swaps - 1:
+                tracker.record_batch(batch_tried, batch_accepted, batch_improvement)
+                batch_tried, batch_accepted, batch_improvement = 0, 0, 0
+
+                if tracker.converged():
+                    break
             
-    anim_snapshots.append(Image.fromarray(img_2.astype('uint8')))
+    gif_writer.add_frame(img_2.astype('uint8'))
 
-    print(img_2.sum())
+    print(tracker.objective)
     print(valid_swaps)
-    print(len(anim_snapshots))
+    gif_writer.close()
+    print(gif_writer.frames)
     mo.image(img_2, width = size[0] * disp_mul, height = size[1] * disp_mul)
-    return (anim_snapshots,)
+    return gif_path, tracker
+
+
+@app.cell
+def _(tracker):
+    mo.ui.table(tracker.metrics, label = "Metrics per batch")
+    return
 
 
 @app.cell
-def _(anim_snapshots):
-    anim_snapshots[0].save(
-        "out.gif",
-        save_all = True,
-        append_images = anim_snapshots[1:],
-        duration = 100,
-        loop = 0
-    )
-    mo.image("out.gif", width = size[0] * disp_mul, height = size[1] * disp_mul)
+def _(gif_path):
+    mo.image(gif_path, width = size[0] * disp_mul, height = size[1] * disp_mul)
     return
 
 
@@ -0,0 +1,594 @@
+from PIL import Image
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scipy.ndimage import convolve
+import numpy as np
+import argparse
+import os
+import time
+
+filter_du = np.array([
+    [1.0, 2.0, 1.0],
+    [0.0, 0.0, 0.0],
+    [-1.0, -2.0, -1.0],
+])
+# This converts it from a 2D filter to a 3D filter, replicating the same
+# filter for each channel: R, G, B
+filter_du = np.stack([filter_du] * 3, axis=2)
+
+filter_dv = np.array([
+    [1.0, 0.0, -1.0],
+    [2.0, 0.0, -2.0],
+    [1.0, 0.0, -1.0],
+])
+# This converts it from a 2D filter to a 3D filter, replicating the same
+# filter for each channel: R, G, B
+filter_dv = np.stack([filter_dv] * 3, axis=2)
+
+
+def calc_energy(img):
+    global filter_du, filter_dv
+
+    img = img.astype('float32')
+    convolved = np.absolute(convolve(img, filter_du)) + np.absolute(convolve(img, filter_dv))
+
+    # We sum the energies in the red, green, and blue channels
+    energy_map = convolved.sum(axis=2)
+
+    return energy_map
+
+
+def report_progress(progress, done, total):
+    # Progress goes to an optional callback, so the same code can drive a
+    # marimo progress bar, a console or nothing at all
+    if progress is not None:
+        progress(done, total)
+
+
+def reflect_index(idx, n):
+    # Same edge handling as the default 'reflect' mode of scipy.ndimage.convolve
+    idx = np.where(idx < 0, -idx - 1, idx)
+    return np.where(idx >= n, 2 * n - idx - 1, idx)
+
+
+def calc_energy_at(img, rows, cols):
+    global filter_du, filter_dv
+
+    r, c, _ = img.shape
+    rows, cols = np.broadcast_arrays(rows, cols)
+    du = np.zeros(rows.shape + (3,), dtype = 'float32')
+    dv = np.zeros(rows.shape + (3,), dtype = 'float32')
+
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            patch = img[reflect_index(rows + di, r), reflect_index(cols + dj, c)].astype('float32')
+            # The 3D filters repeat across R, G and B, so each channel sees the
+            # sum of itself and its reflected neighbouring channels
+            channel_sums = patch[..., [0, 0, 1]] + patch[..., [0, 1, 2]] + patch[..., [1, 2, 2]]
+
+            # convolve flips the filter, hence the weight for offset d is at 1 - d
+            du += filter_du[1 - di, 1 - dj, 0] * channel_sums
+            dv += filter_dv[1 - di, 1 - dj, 0] * channel_sums
+
+    # Values stay small whole numbers, so this matches calc_energy exactly
+    return (np.absolute(du) + np.absolute(dv)).sum(axis = -1)
+
+
+def dp_scratch(c, dtype):
+    # Buffers for cumulative_energy on images up to c columns wide
+    return (
+        np.empty((3, c), dtype = dtype),
+        np.arange(c),
+        np.empty(c, dtype = np.intp),
+        np.empty(c, dtype = dtype),
+    )
+
+
+def cumulative_energy(energy_map, out = None, scratch = None):
+    r, c = energy_map.shape
+
+    if out is None:
+        M = energy_map.copy()
+        backtrack = np.zeros_like(M, dtype = int)
+    else:
+        M, backtrack = out
+        M[...] = energy_map
+        backtrack[0] = 0
+
+    if scratch is None:
+        scratch = dp_scratch(c, M.dtype)
+    candidates, cols, idx, chosen = (buf[..., :c] for buf in scratch)
+
+    # Row above shifted so that column j sees columns j - 1, j and j + 1 in that
+    # order. The inf padding handles the left and right edges, and argmin picks
+    # the leftmost of equal minimums just like the per-pixel loop did
+    candidates[0, 0] = np.inf
+    candidates[2, -1] = np.inf
+
+    # Every row is written into the buffers through out=, so that no
+    # temporaries are allocated
+    for i in range(1, r):
+        candidates[0, 1:] = M[i - 1, :-1]
+        candidates[1] = M[i - 1]
+        candidates[2, :-1] = M[i - 1, 1:]
+
+        np.argmin(candidates, axis = 0, out = idx)
+        np.add(cols, idx, out = backtrack[i])
+        np.subtract(backtrack[i], 1, out = backtrack[i])
+        # The value at argmin is the minimum itself
+        np.min(candidates, axis = 0, out = chosen)
+        np.add(M[i], chosen, out = M[i])
+
+    return M, backtrack
+
+
+def find_seam(M, backtrack):
+    r = M.shape[0]
+    seam = np.zeros(r, dtype = int)
+
+    j = np.argmin(M[-1])
+    for i in reversed(range(r)):
+        seam[i] = j
+        j = backtrack[i, j]
+
+    return seam
+
+
+def remove_seam_in_place(buf, seam, width, scratch):
+    # Shifts the pixels right of the seam one place left, within the first
+    # `width` columns. The scratch row avoids the temporary copy numpy would
+    # otherwise make for the overlapping source and destination
+    for i, j in enumerate(seam):
+        n = width - j - 1
+        scratch[:n] = buf[i, j + 1:width]
+        buf[i, j:width - 1] = scratch[:n]
+
+    return width - 1
+
+
+def remove_seams_in_place(buf, seams, width, scratch, keep):
+    # Removes several seams at once, sorted left to right in every row, within
+    # the first `width` columns. The kept pixels of a row are gathered into
+    # the scratch row first, as the source and destination overlap
+    new_width = width - seams.shape[1]
+
+    for i, row_seams in enumerate(seams):
+        keep[:width] = True
+        keep[row_seams] = False
+        np.compress(keep[:width], buf[i, :width], axis = 0, out = scratch[:new_width])
+        buf[i, :new_width] = scratch[:new_width]
+
+    return new_width
+
+
+def carve_seams_in_place(buf, n_seams):
+    r, c = buf.shape[:2]
+    width = c
+
+    # Everything is allocated once, later seams work on the first `width`
+    # columns of the same buffers
+    energy_map = calc_energy(buf)
+    M = np.empty_like(energy_map)
+    backtrack = np.empty((r, c), dtype = int)
+    scratch = np.empty((c,) + buf.shape[2:], dtype = buf.dtype)
+    energy_scratch = np.empty(c, dtype = energy_map.dtype)
+    scratch_dp = dp_scratch(c, M.dtype)
+
+    for _ in range(n_seams):
+        cumulative_energy(energy_map[:, :width], out = (M[:, :width], backtrack[:, :width]), scratch = scratch_dp)
+        seam = find_seam(M[:, :width], backtrack[:, :width])
+        # The cumulative energy at the end of the seam is the energy it removes
+        seam_energy = float(M[-1, seam[-1]])
+
+        remove_seam_in_place(buf, seam, width, scratch)
+        width = remove_seam_in_place(energy_map, seam, width, energy_scratch)
+        update_energy(buf[:, :width], energy_map[:, :width], seam)
+
+        yield seam, seam_energy
+
+
+def update_energy(img, energy_map, seam):
+    r, c, _ = img.shape
+
+    # After removing a seam, only the pixels whose 3x3 neighbourhood crossed it
+    # change. As neighbouring rows' seam positions differ by at most 1, these
+    # are the columns seam - 2 to seam + 1 of the carved image. Several seams
+    # removed at once are given as the columns of a 2D `seam`
+    rows = np.arange(r)[:, np.newaxis]
+    cols = np.clip((seam.reshape(r, -1, 1) + np.arange(-2, 2)).reshape(r, -1), 0, c - 1)
+
+    energy_map[rows, cols] = calc_energy_at(img, rows, cols)
+    return energy_map
+
+
+def crop_c(img, scale_c, seam_order = None, progress = None):
+    r, c, _ = img.shape
+    new_c = int(scale_c * c)
+
+    if seam_order is not None:
+        return retarget_c(img, seam_order, new_c)
+
+    # A single working copy, carved in place
+    buf = np.array(img)
+    for i, _ in enumerate(carve_seams_in_place(buf, c - new_c)):
+        report_progress(progress, i + 1, c - new_c)
+
+    return buf[:, :new_c]
+
+
+def crop_r(img, scale_r, seam_order = None, progress = None):
+    if seam_order is not None:
+        img = retarget_c(np.rot90(img, 1, (0, 1)), np.rot90(seam_order, 1, (0, 1)), int(scale_r * img.shape[0]))
+        return np.rot90(img, 3, (0, 1))
+
+    r, c, _ = img.shape
+    new_r = int(scale_r * r)
+
+    # Rows are carved as the columns of a rotated view of the working copy,
+    # so no rotated copies are made
+    buf = np.array(img)
+    view = np.rot90(buf, 1, (0, 1))
+    for i, _ in enumerate(carve_seams_in_place(view, r - new_r)):
+        report_progress(progress, i + 1, r - new_r)
+
+    return np.rot90(view[:, :new_r], 3, (0, 1))
+
+
+def find_seams(M, backtrack, k, energy_tolerance = None):
+    r, c = M.shape
+
+    # The cheapest seam ends, limited to those within the tolerance of the best
+    ends = np.argsort(M[-1], kind = 'stable')
+    if energy_tolerance is not None:
+        ends = ends[M[-1, ends] <= M[-1, ends[0]] * (1 + energy_tolerance)]
+    ends = np.sort(ends[:k])
+
+    n = len(ends)
+    offsets = np.arange(n)
+    seams = np.empty((r, n), dtype = int)
+    seams[-1] = ends
+
+    # All seams are traced upwards together. A seam that would run into the one
+    # on its left is pushed right, so that they never share a pixel and every
+    # row loses exactly n pixels
+    for i in range(r - 1, 0, -1):
+        cols = backtrack[i, seams[i]]
+        cols = np.maximum.accumulate(cols - offsets) + offsets
+        seams[i - 1] = np.minimum(cols, c - n + offsets)
+
+    return seams
+
+
+def carve_seams_batched(buf, n_seams, k = 16, energy_tolerance = 0.5):
+    r, c = buf.shape[:2]
+    rows = np.arange(r)[:, np.newaxis]
+    width = c
+
+    # Allocated once like carve_seams_in_place, only the cumulative energy is
+    # recomputed for every batch
+    energy_map = calc_energy(buf)
+    M = np.empty_like(energy_map)
+    backtrack = np.empty((r, c), dtype = int)
+    scratch = np.empty((c,) + buf.shape[2:], dtype = buf.dtype)
+    energy_scratch = np.empty(c, dtype = energy_map.dtype)
+    keep = np.empty(c, dtype = bool)
+    scratch_dp = dp_scratch(c, M.dtype)
+
+    while n_seams > 0:
+        cumulative_energy(energy_map[:, :width], out = (M[:, :width], backtrack[:, :width]), scratch = scratch_dp)
+        seams = find_seams(M[:, :width], backtrack[:, :width], min(k, n_seams), energy_tolerance)
+        removed_energy = float(energy_map[rows, seams].sum())
+
+        remove_seams_in_place(buf, seams, width, scratch, keep)
+        width = remove_seams_in_place(energy_map, seams, width, energy_scratch, keep)
+        # Each seam leaves its gap where it is less the seams removed to its left
+        update_energy(buf[:, :width], energy_map[:, :width], seams - np.arange(seams.shape[1]))
+
+        n_seams -= seams.shape[1]
+        yield seams, removed_energy
+
+
+def crop_c_batched(img, scale_c, k = 16, energy_tolerance = 0.5, progress = None):
+    r, c, _ = img.shape
+    new_c = int(scale_c * c)
+    done = 0
+
+    buf = np.array(img)
+    for seams, _ in carve_seams_batched(buf, c - new_c, k, energy_tolerance):
+        done += seams.shape[1]
+        report_progress(progress, done, c - new_c)
+
+    return buf[:, :new_c]
+
+
+def benchmark_approximate_carving(img, scale_c, k_values = (4, 16, 64), energy_tolerance = 0.5, pyramid_levels = (2, 3)):
+    r, c, _ = img.shape
+    n_seams = c - int(scale_c * c)
+    results = []
+
+    start = time.perf_counter()
+    removed_energy = sum(seam_energy for _, seam_energy in carve_seams_in_place(np.array(img), n_seams))
+    results.append({
+        "mode": "exact",
+        "seconds": time.perf_counter() - start,
+        "removed_energy": removed_energy
+    })
+
+    for k in k_values:
+        start = time.perf_counter()
+        removed_energy = sum(batch_energy for _, batch_energy in carve_seams_batched(np.array(img), n_seams, k, energy_tolerance))
+
+        results.append({
+            "mode": f"batched, k = {k}",
+            "seconds": time.perf_counter() - start,
+            "removed_energy": removed_energy
+        })
+
+    for levels in pyramid_levels:
+        start = time.perf_counter()
+        removed_energy = sum(seam_energy for _, seam_energy in carve_seams_pyramid(np.array(img), n_seams, levels))
+        results.append({
+            "mode": f"pyramid, levels = {levels}",
+            "seconds": time.perf_counter() - start,
+            "removed_energy": removed_energy
+        })
+
+    for result in results:
+        result["speedup"] = results[0]["seconds"] / result["seconds"]
+        result["energy_ratio"] = result["removed_energy"] / results[0]["removed_energy"] if results[0]["removed_energy"] else None
+
+    return results
+
+
+def pooled_energy(energy_map, f):
+    r, c = energy_map.shape
+    row_starts = np.arange(0, r, f)
+    col_starts = np.arange(0, c, f)
+
+    # Mean rather than sum, so that the smaller blocks at the edges are not
+    # mistaken for low energy ones
+    sums = np.add.reduceat(np.add.reduceat(energy_map, row_starts, axis = 0), col_starts, axis = 1)
+    counts = np.outer(np.diff(np.append(row_starts, r)), np.diff(np.append(col_starts, c)))
+    return sums / counts
+
+
+def pooled_energy_at(energy_map, f, rows, cols):
+    r, c = energy_map.shape
+    d = np.arange(f)
+
+    # Mean energy of the f x f blocks at the given rows and columns of the
+    # pyramid level with block size f
+    block_rows = rows[..., np.newaxis, np.newaxis] * f + d[:, np.newaxis]
+    block_cols = cols[..., np.newaxis, np.newaxis] * f + d[np.newaxis, :]
+    valid = (block_rows < r) & (block_cols < c)
+    values = energy_map[np.minimum(block_rows, r - 1), np.minimum(block_cols, c - 1)]
+
+    return (values * valid).sum(axis = (-2, -1)) / valid.sum(axis = (-2, -1))
+
+
+def corridor_seam(band, offsets):
+    # band[i, t] is the energy of column offsets[i] + t of row i
+    R, w = band.shape
+    M = band.astype('float64')
+    backtrack = np.zeros((R, w), dtype = int)
+    padded = np.full(w + 2, np.inf)
+    t = np.arange(w)
+
+    # Columns j - 1, j and j + 1 of the row above, as positions in its own
+    # corridor. Those outside of it land on the inf padding
+    shifts = np.diff(offsets, prepend = offsets[0])
+    prev_idx = np.clip(t + shifts[:, np.newaxis, np.newaxis] + np.arange(3)[:, np.newaxis], 0, w + 1)
+
+    for i in range(1, R):
+        padded[1:-1] = M[i - 1]
+        candidates = padded[prev_idx[i]]
+        idx = np.argmin(candidates, axis = 0)
+        M[i] += candidates[idx, t]
+        backtrack[i] = offsets[i] + t + idx - 1
+
+    seam = np.empty(R, dtype = int)
+    seam[-1] = offsets[-1] + np.argmin(M[-1])
+    for i in range(R - 1, 0, -1):
+        seam[i - 1] = backtrack[i, seam[i] - offsets[i]]
+
+    return seam
+
+
+def carve_seams_pyramid(buf, n_seams, levels = 2, corridor = 2, refresh = None):
+    r, c = buf.shape[:2]
+    f = 2 ** levels
+    refresh = refresh or f
+    width = c
+
+    energy_map = calc_energy(buf)
+    scratch = np.empty((c,) + buf.shape[2:], dtype = buf.dtype)
+    energy_scratch = np.empty(c, dtype = energy_map.dtype)
+
+    for s in range(n_seams):
+        # The seam is found on the coarsest level, which is only rebuilt every
+        # `refresh` seams, as its blocks barely change with a single seam
+        if s % refresh == 0:
+            M, backtrack = cumulative_energy(pooled_energy(energy_map[:, :width], f))
+            coarse_seam = find_seam(M, backtrack)
+
+        # Then refined on every finer level, only searching a narrow corridor
+        # around the seam of the level above
+        seam = coarse_seam
+        for level in range(levels - 1, -1, -1):
+            fl = 2 ** level
+            r_l = -(-r // fl)
+            c_l = -(-width // fl)
+            w = min(2 + 2 * corridor, c_l)
+
+            rows = np.arange(r_l)
+            offsets = np.clip(2 * seam[rows // 2] - corridor, 0, c_l - w)
+            band = pooled_energy_at(energy_map[:, :width], fl, rows[:, np.newaxis], offsets[:, np.newaxis] + np.arange(w))
+            seam = corridor_seam(band, offsets)
+
+        seam_energy = float(energy_map[np.arange(r), seam].sum())
+
+        remove_seam_in_place(buf, seam, width, scratch)
+        width = remove_seam_in_place(energy_map, seam, width, energy_scratch)
+        update_energy(buf[:, :width], energy_map[:, :width], seam)
+
+        yield seam, seam_energy
+
+
+def crop_c_pyramid(img, scale_c, levels = 2, corridor = 2, progress = None):
+    r, c, _ = img.shape
+    new_c = int(scale_c * c)
+
+    buf = np.array(img)
+    for i, _ in enumerate(carve_seams_pyramid(buf, c - new_c, levels, corridor)):
+        report_progress(progress, i + 1, c - new_c)
+
+    return buf[:, :new_c]
+
+
+def seam_order_c(img, min_scale_c, progress = None):
+    r, c, _ = img.shape
+    min_c = int(min_scale_c * c)
+
+    # Iteration in which each pixel of the original image is carved away, with
+    # pixels that are never carved getting the largest possible value
+    seam_order = np.full((r, c), np.iinfo(np.int32).max, dtype = np.int32)
+    original_cols = np.tile(np.arange(c), (r, 1))
+    col_scratch = np.empty(c, dtype = original_cols.dtype)
+    width = c
+    rows = np.arange(r)
+
+    for i, (seam, _) in enumerate(carve_seams_in_place(np.array(img), c - min_c)):
+        seam_order[rows, original_cols[rows, seam]] = i
+        width = remove_seam_in_place(original_cols, seam, width, col_scratch)
+        report_progress(progress, i + 1, c - min_c)
+
+    return seam_order
+
+
+def seam_order_r(img, min_scale_r, progress = None):
+    seam_order = seam_order_c(np.rot90(img, 1, (0, 1)), min_scale_r, progress)
+    return np.ascontiguousarray(np.rot90(seam_order, 3, (0, 1)))
+
+
+def retarget_c(img, seam_order, new_c):
+    r, c, _ = img.shape
+    carved = c - new_c
+
+    if carved > 0 and np.count_nonzero(seam_order[0] < np.iinfo(np.int32).max) < carved:
+        raise ValueError("The seam order does not go down to the requested width.")
+
+    # Every row loses exactly one pixel per seam, so each row keeps new_c pixels
+    keep = seam_order >= carved
+    return img[keep].reshape((r, new_c, 3))
+
+
+def save_seam_order(path, seam_order, axis):
+    np.savez_compressed(path, seam_order = seam_order, axis = axis)
+
+
+def load_seam_order(path):
+    with np.load(path) as data:
+        return data['seam_order'], str(data['axis'])
+
+
+CarveJob = namedtuple("CarveJob", ["img_path", "axis", "scales", "out_dir", "mode"])
+CarveResult = namedtuple("CarveResult", ["job", "out_paths", "seams", "seconds"])
+BatchSummary = namedtuple("BatchSummary", ["results", "workers", "seams", "seconds"])
+
+carve_modes = ["exact", "batched", "pyramid"]
+
+
+def carve(img, axis, scale, mode = "exact", progress = None):
+    if mode == "exact":
+        crop = crop_c
+    elif mode == "batched":
+        crop = crop_c_batched
+    elif mode == "pyramid":
+        crop = crop_c_pyramid
+    else:
+        raise ValueError(f"Invalid mode '{mode}'. The accepted values are {', '.join(carve_modes)}.")
+
+    if axis == "columns":
+        return crop(img, scale, progress = progress)
+    elif axis == "rows":
+        return np.rot90(crop(np.rot90(img, 1, (0, 1)), scale, progress = progress), 3, (0, 1))
+    else:
+        raise ValueError(f"Invalid axis '{axis}'. The accepted values are columns and rows.")
+
+
+def run_job(job, progress = None):
+    start = time.perf_counter()
+
+    img = np.array(Image.open(job.img_path).convert('RGB'))
+    n = img.shape[1] if job.axis == "columns" else img.shape[0]
+
+    if job.mode == "exact":
+        # A single seam order down to the smallest size serves every target size
+        min_scale = min(job.scales)
+        if job.axis == "columns":
+            seam_order = seam_order_c(img, min_scale, progress)
+            carved_imgs = [crop_c(img, scale, seam_order) for scale in job.scales]
+        else:
+            seam_order = seam_order_r(img, min_scale, progress)
+            carved_imgs = [crop_r(img, scale, seam_order) for scale in job.scales]
+        seams = n - int(min_scale * n)
+    else:
+        carved_imgs = [carve(img, job.axis, scale, job.mode, progress) for scale in job.scales]
+        seams = sum(n - int(scale * n) for scale in job.scales)
+
+    stem, ext = os.path.splitext(os.path.basename(job.img_path))
+    os.makedirs(job.out_dir, exist_ok = True)
+
+    out_paths = []
+    for scale, carved_img in zip(job.scales, carved_imgs):
+        out_path = os.path.join(job.out_dir, f"{stem}_{job.axis}_{round(scale * 100)}{ext}")
+        Image.fromarray(np.ascontiguousarray(carved_img)).save(out_path)
+        out_paths.append(out_path)
+
+    return CarveResult(job, out_paths, seams, time.perf_counter() - start)
+
+
+def print_result(result):
+    print(f"Carved {result.job.img_path} to {len(result.out_paths)} sizes. Took {round(result.seconds, 2)}s "
+          f"({round(result.seams / result.seconds, 2)} seams/s).")
+
+
+def print_summary(summary):
+    print(f"Finished {len(summary.results)} images on {summary.workers} workers. Took {round(summary.seconds, 2)}s "
+          f"({round(summary.seams / summary.seconds, 2)} seams/s).")
+
+
+def run_batch(jobs, workers = None, on_result = None, progress = None):
+    # Results and progress go to optional callbacks in this process, as the
+    # jobs run in workers that cannot reach a caller's progress bar
+    start = time.perf_counter()
+    workers = workers or os.cpu_count()
+
+    results = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            if on_result is not None:
+                on_result(result)
+            report_progress(progress, len(results), len(jobs))
+
+    total_seams = sum(result.seams for result in results)
+    return BatchSummary(results, workers, total_seams, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Carve images to smaller sizes with seam carving.")
+    parser.add_argument("images", nargs = "+", help = "Paths of the images to carve")
+    parser.add_argument("--axis", choices = ["columns", "rows"], default = "columns", help = "Axis to carve")
+    parser.add_argument("--scales", type = float, nargs = "+", default = [0.9], help = "Relative target sizes along the axis")
+    parser.add_argument("--mode", choices = carve_modes, default = "exact", help = "Exact carving or one of the faster approximate ones")
+    parser.add_argument("--out-dir", default = "carved", help = "Directory to save the carved images to")
+    parser.add_argument("--workers", type = int, help = "Number of worker processes, one per CPU by default")
+    cmd_args = parser.parse_args()
+
+    jobs = [CarveJob(img_path, cmd_args.axis, cmd_args.scales, cmd_args.out_dir, cmd_args.mode) for img_path in cmd_args.images]
+    print_summary(run_batch(jobs, cmd_args.workers, on_result = print_result))
@@ -16,26 +16,14 @@ app = marimo.App(width="medium", layout_file="layouts/SeamCarving.grid.json")
 with app.setup:
     import marimo as mo
     import numpy as np
-    from scipy.ndimage import convolve
     from PIL import Image
-
-    filter_du = np.array([
-        [1.0, 2.0, 1.0],
-        [0.0, 0.0, 0.0],
-        [-1.0, -2.0, -1.0],
-    ])
-    # This converts it from a 2D filter to a 3D filter, replicating the same
-    # filter for each channel: R, G, B
-    filter_du = np.stack([filter_du] * 3, axis=2)
-
-    filter_dv = np.array([
-        [1.0, 0.0, -1.0],
-        [2.0, 0.0, -2.0],
-        [1.0, 0.0, -1.0],
-    ])
-    # This converts it from a 2D filter to a 3D filter, replicating the same
-    # filter for each channel: R, G, B
-    filter_dv = np.stack([filter_dv] * 3, axis=2)# Initialization code that runs before all other cells
+    from SeamCarver import (
+        benchmark_approximate_carving,
+        crop_c,
+        crop_r,
+        seam_order_c,
+        seam_order_r,
+    )
 
 
 @app.cell
@@ -63,84 +51,24 @@ def _():
 
 
 @app.function
-def calc_energy(img):
-    global filter_du, filter_dv
-
-    img = img.astype('float32')
-    convolved = np.absolute(convolve(img, filter_du)) + np.absolute(convolve(img, filter_dv))
-
-    # We sum the energies in the red, green, and blue channels
-    energy_map = convolved.sum(axis=2)
-
-    return energy_map
-
-
-@app.function
-def minimum_seam(img):
-    r, c, _ = img.shape
-    energy_map = calc_energy(img)
-
-    M = energy_map.copy()
-    backtrack = np.zeros_like(M, dtype = int)
-
-    for i in range(1, r):
-        for j in range(0, c):
-            # Handle the left edge of the image, to ensure we don't index a -1
-            if j == 0:
-                idx = np.argmin(M[i-1, j:j + 2])
-                backtrack[i, j] = idx + j
-                min_energy = M[i-1, idx + j]
-            else:
-                idx = np.argmin(M[i - 1, j - 1:j + 2])
-                backtrack[i, j] = idx + j - 1
-                min_energy = M[i - 1, idx + j - 1]
-
-            M[i, j] += min_energy
-
-    return M, backtrack
-
-
-@app.function
-def carve_column(img):
-    r, c, _ = img.shape
-
-    M, backtrack = minimum_seam(img)
-    mask = np.ones((r, c), dtype = bool)
-
-    j = np.argmin(M[-1])
-    for i in reversed(range(r)):
-        mask[i, j] = False
-        j = backtrack[i, j]
-
-    mask = np.stack([mask] * 3, axis=2)
-    img = img[mask].reshape((r, c - 1, 3))
-    return img
-
-
-@app.function
-def crop_c(img, scale_c):
-    r, c, _ = img.shape
-    new_c = int(scale_c * c)
+def with_progress_bar(title, total, func, *args):
+    # SeamCarver reports how many seams are done so far, the bar wants increments
+    last_done = 0
 
-    for i in mo.status.progress_bar(
-        range(c - new_c),
-        title = "Carving image",
+    with mo.status.progress_bar(
+        total = total,
+        title = title,
         subtitle = "Please wait",
         show_eta = True,
         show_rate = True,
         remove_on_exit = True
-    ):
-        img = carve_column(img)
-
-    return img
+    ) as bar:
+        def progress(done, _):
+            nonlocal last_done
+            bar.update(increment = done - last_done)
+            last_done = done
 
-
-@app.function
-def crop_r(img, scale_r):
-    img = np.rot90(img, 1, (0, 1))
-    img = crop_c(img, scale_r)
-    img = np.rot90(img, 3, (0, 1))
-    return img
+        return func(*args, progress = progress)
 
 
 @app.cell
@@ -198,6 +126,14 @@ def _():
     return (form,)
 
 
+@app.cell
+def _():
+    # Seam orders already built, per image and axis, so that carving the same
+    # image to another scale does not carve it again
+    seam_orders = {}
+    return (seam_orders,)
+
+
 @app.cell
 def _(form):
     mo.stop(not form.value, "Submit the form above to run")
@@ -209,19 +145,30 @@ def _(form):
         mo.md(f"#### Size: {img.width} X {img.height}"),
         img
     ])
-    return (img,)
+    return img, img_path
 
 
 @app.cell
-def _(form, img):
+def _(form, img, img_path, seam_orders):
     img_array = np.array(img)
     which_axis = form.value['col_row_selector']
     scale = form.value['scale_slider']
+    min_scale = 0.5
+
+    if (img_path, which_axis) not in seam_orders:
+        if which_axis == 'columns':
+            n = img_array.shape[1]
+            seam_orders[(img_path, which_axis)] = with_progress_bar("Building seam order", n - int(min_scale * n), seam_order_c, img_array, min_scale)
+        elif which_axis == 'rows':
+            n = img_array.shape[0]
+            seam_orders[(img_path, which_axis)] = with_progress_bar("Building seam order", n - int(min_scale * n), seam_order_r, img_array, min_scale)
+
+    seam_order = seam_orders[(img_path, which_axis)]
 
     if which_axis == 'columns':
-        carved_img = crop_c(img_array, scale)
+        carved_img = crop_c(img_array, scale, seam_order)
     elif which_axis == 'rows':
-        carved_img = crop_r(img_array, scale)
+        carved_img = crop_r(img_array, scale, seam_order)
 
     carved_img = Image.fromarray(carved_img)
 
@@ -233,6 +180,29 @@ def _(form, img):
     return
 
 
+@app.cell
+def _():
+    mo.md(r"""
+    ## Exact vs approximate carving
+    """)
+    return
+
+
+@app.cell
+def _():
+    benchmark_button = mo.ui.run_button(label = "Compare on the selected image")
+    benchmark_button
+    return (benchmark_button,)
+
+
+@app.cell
+def _(benchmark_button, form, img):
+    mo.stop(not benchmark_button.value, "Click the button above to compare exact carving with batched and pyramid carving")
+
+    mo.ui.table(benchmark_approximate_carving(np.array(img), form.value['scale_slider']))
+    return
+
+
 @app.cell
 def _():
     return
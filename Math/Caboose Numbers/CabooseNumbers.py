@@ -1,34 +1,40 @@
+from collections.abc import Callable
 from time import perf_counter
-from functools import lru_cache
 
-from sympy import isprime
+from PrimeOracle import PrimeOracle
 
 UPPER_BOUND = 1_000_000_000
 '''Limit to which to check for caboose numbers'''
 
-MAX_CACHE_SIZE = 100_000_000
-'''Limit that decides whether to set up an unbounded cache or not'''
+SIEVE_MARGIN = 1 << 20
+'''How far past the upper bound the sieve reaches, to cover the next prime and the m * m - m + n values with small m'''
 
-if UPPER_BOUND < MAX_CACHE_SIZE:
-    is_prime = lru_cache(maxsize = None)(isprime)
-else:
-    is_prime = isprime
+def is_caboose(n: int, is_prime: Callable[[int], bool]) -> bool:
+    '''Checks whether a prime n is a caboose number'''
 
-def find_caboose(upper_bound: int):
+    caboose_eq = lambda m, n: (m * m) - m + n
+
+    #Can start from 2 since for m = 0 or m = 1, eq will always result in n which has been restricted here to always be a prime
+    for m in range(2, n): 
+        if not is_prime(caboose_eq(m, n)):
+            return False
+
+    return True
+
+def find_caboose(upper_bound: int, oracle: PrimeOracle | None = None):
     '''Checks for caboose numbers up to a specified limit'''
 
-    caboose_eq = lambda m, n: (m * m) - m + n
+    if oracle is None:
+        oracle = PrimeOracle(upper_bound + SIEVE_MARGIN)
+    is_prime = oracle.is_prime
+
     caboose_nums = [2] #2 is the only even caboose number
 
     n = 3 #Starting point of search
     start_time = perf_counter()
 
     while n <= upper_bound:
-        #Can start from 2 since for m = 0 or m = 1, eq will always result in n which has been restricted here to always be a prime
-        for m in range(2, n): 
-            if not is_prime(caboose_eq(m, n)):
-                break
-        else: #Only executed if the for loop above completed without hitting a break
+        if is_caboose(n, is_prime):
             print(f"Found caboose: {n:>6} | {perf_counter() - start_time:.4f}s")
             caboose_nums.append(n)
         
@@ -40,9 +46,13 @@ def find_caboose(upper_bound: int):
 
 if __name__ == "__main__":
     start_time = perf_counter()
-    find_caboose(UPPER_BOUND)
+    oracle = PrimeOracle(UPPER_BOUND + SIEVE_MARGIN)
+    print(f"Sieve built: {perf_counter() - start_time:.2f}s")
+
+    find_caboose(UPPER_BOUND, oracle)
     print(f"\nTime taken: {perf_counter() - start_time:.2f}s")
 
-    if hasattr(is_prime, "cache_info"):
-        cache_info = is_prime.cache_info()
-        print(f"Cache hit ratio: {cache_info.hits / (cache_info.hits + cache_info.misses):.2%}")
\ No newline at end of file
+    stats = oracle.stats()
+    lookups = stats.sieve_lookups + stats.fallback_lookups
+    print(f"Sieve size: {stats.sieve_bytes / 2 ** 20:.2f} MB for numbers below {stats.limit:,}")
+    print(f"Lookups: {lookups:,} | Sieve: {stats.sieve_lookups / lookups:.2%} | Miller-Rabin: {stats.fallback_lookups / lookups:.2%}")
\ No newline at end of file
@@ -0,0 +1,100 @@
+from collections import namedtuple
+from math import isqrt
+
+import numpy as np
+
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+'''Bases for which Miller-Rabin is deterministic for every number below 3.3 * 10^24, so all 64 bit numbers'''
+
+SEGMENT_SIZE = 1 << 24
+'''Numbers sieved at a time, which bounds the temporary memory used while building the sieve'''
+
+OracleStats = namedtuple("OracleStats", ["low", "limit", "sieve_bytes", "sieve_lookups", "fallback_lookups"])
+
+def is_prime_miller_rabin(n: int) -> bool:
+    '''Deterministic Miller-Rabin test for any number below 3.3 * 10^24'''
+
+    if n < 2:
+        return False
+    for p in MILLER_RABIN_BASES:
+        if n % p == 0:
+            return n == p
+
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for a in MILLER_RABIN_BASES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+
+    return True
+
+def odd_base_primes(limit: int) -> np.ndarray:
+    '''Odd primes up to and including the specified limit, from a plain sieve'''
+
+    sieve = np.ones(limit + 1, dtype = bool)
+    sieve[:3] = False
+    sieve[4::2] = False
+    for p in range(3, isqrt(limit) + 1, 2):
+        if sieve[p]:
+            sieve[p * p::2 * p] = False
+
+    return np.flatnonzero(sieve)
+
+class PrimeOracle:
+    '''Answers primality queries for the numbers in [low, limit) from a bit-packed sieve of the odd numbers, and for any other number with Miller-Rabin'''
+
+    def __init__(self, limit: int, low: int = 0):
+        #Both ends are rounded to multiples of 16, so that every byte of the sieve holds the same 8 odd numbers of a whole segment
+        self.low = low - low % 16
+        self.limit = limit + (-limit) % 16
+        self.sieve_lookups = 0
+        self.fallback_lookups = 0
+
+        #Bit i is set if the odd number low + 2 * i + 1 is prime
+        self.bits = bytearray((self.limit - self.low) // 16)
+        base_primes = odd_base_primes(isqrt(self.limit))
+
+        for seg_low in range(self.low, self.limit, SEGMENT_SIZE):
+            seg_high = min(seg_low + SEGMENT_SIZE, self.limit)
+            is_prime = np.ones((seg_high - seg_low) // 2, dtype = bool)
+
+            for p in base_primes:
+                #First odd multiple of p in the segment, never below p * p so that p itself stays marked as prime
+                start = max(p * p, -(-(seg_low + 1) // p) * p)
+                if start % 2 == 0:
+                    start += p
+                is_prime[(start - seg_low - 1) // 2::p] = False
+
+            if seg_low == 0:
+                is_prime[0] = False #1 is not a prime
+
+            self.bits[(seg_low - self.low) // 16:(seg_high - self.low) // 16] = np.packbits(is_prime, bitorder = "little").tobytes()
+
+    def is_prime(self, n: int) -> bool:
+        '''Checks whether a number is prime, from the sieve if it covers the number'''
+
+        if n % 2 == 0:
+            return n == 2
+
+        if self.low <= n < self.limit:
+            self.sieve_lookups += 1
+            i = (n - self.low) >> 1
+            return (self.bits[i >> 3] >> (i & 7)) & 1 == 1
+
+        self.fallback_lookups += 1
+        return is_prime_miller_rabin(n)
+
+    def stats(self) -> OracleStats:
+        '''Range and memory footprint of the sieve, along with the number of lookups answered by it and by Miller-Rabin'''
+
+        return OracleStats(self.low, self.limit, len(self.bits), self.sieve_lookups, self.fallback_lookups)
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+import json
+import os
+
+from CabooseNumbers import UPPER_BOUND, SIEVE_MARGIN, is_caboose
+from PrimeOracle import PrimeOracle
+
+WORKERS = os.cpu_count()
+'''Number of worker processes'''
+
+SHARDS_PER_WORKER = 4
+'''Shards per worker, so that a slow shard does not leave the other workers idle at the end'''
+
+CHECKPOINT_DIR = "checkpoints"
+'''Directory with one JSON checkpoint per shard, which a restarted search resumes from'''
+
+CHECKPOINT_SECONDS = 30
+'''Time between the checkpoints of a shard'''
+
+ShardResult = namedtuple("ShardResult", ["index", "checkpoint", "worker", "candidates", "seconds"])
+
+def get_shards(upper_bound: int, num_shards: int) -> list[tuple[int, int]]:
+    '''Splits the numbers from 3 to the upper bound into contiguous, inclusive ranges'''
+
+    bounds = [3 + (upper_bound - 2) * i // num_shards for i in range(num_shards + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(num_shards) if bounds[i] < bounds[i + 1]]
+
+def get_checkpoint_file(checkpoint_dir: str, low: int, high: int) -> str:
+    '''Checkpoint files are named after the range of the shard, so a search with different shards never picks them up'''
+
+    return os.path.join(checkpoint_dir, f"shard_{low}_{high}.json")
+
+def load_checkpoint(checkpoint_file: str, low: int, high: int) -> dict:
+    '''Loads the checkpoint of a shard, or a fresh one if there is none yet'''
+
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file) as f:
+            return json.load(f)
+
+    return {"low": low, "high": high, "last_verified": low - 1, "caboose": [], "candidates": 0, "seconds": 0.0, "done": False}
+
+def save_checkpoint(checkpoint_file: str, checkpoint: dict):
+    '''Writes the checkpoint to a temporary file first, so that an interrupted write never leaves a broken checkpoint behind'''
+
+    temp_file = checkpoint_file + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_file, checkpoint_file)
+
+def search_shard(index: int, low: int, high: int, checkpoint_dir: str) -> ShardResult:
+    '''Checks the primes in a shard for caboose numbers, starting after the last verified one'''
+
+    checkpoint_file = get_checkpoint_file(checkpoint_dir, low, high)
+    checkpoint = load_checkpoint(checkpoint_file, low, high)
+    if checkpoint["done"]:
+        return ShardResult(index, checkpoint, None, 0, 0.0)
+
+    #The sieve only covers the range of this shard
+    oracle = PrimeOracle(high + SIEVE_MARGIN, low = low)
+    is_prime = oracle.is_prime
+
+    n = checkpoint["last_verified"] + 1
+    n += 1 - n % 2 #Even caboose numbers other than 2 are not possible
+    while not is_prime(n):
+        n += 2
+
+    candidates = 0
+    start_time = last_save_time = perf_counter()
+
+    while n <= high:
+        if is_caboose(n, is_prime):
+            print(f"Found caboose: {n:>6} | Shard {index}")
+            checkpoint["caboose"].append(n)
+
+        checkpoint["last_verified"] = n
+        candidates += 1
+
+        n += 2
+        while not is_prime(n):
+            n += 2
+
+        if perf_counter() - last_save_time >= CHECKPOINT_SECONDS:
+            last_save_time = perf_counter()
+            save_checkpoint(checkpoint_file, dict(checkpoint, candidates = checkpoint["candidates"] + candidates, seconds = checkpoint["seconds"] + last_save_time - start_time))
+            print(f"Shard {index:>3} | Worker {os.getpid()} | n = {checkpoint['last_verified']:,} | {candidates / (last_save_time - start_time):,.0f} candidates/s", flush = True)
+
+    seconds = perf_counter() - start_time
+    checkpoint.update(last_verified = high, candidates = checkpoint["candidates"] + candidates, seconds = checkpoint["seconds"] + seconds, done = True)
+    save_checkpoint(checkpoint_file, checkpoint)
+
+    return ShardResult(index, checkpoint, os.getpid(), candidates, seconds)
+
+def run_search(upper_bound: int, workers: int = WORKERS, shards_per_worker: int = SHARDS_PER_WORKER, checkpoint_dir: str = CHECKPOINT_DIR) -> list[int]:
+    '''Searches for caboose numbers up to the upper bound on several processes, resuming from any earlier checkpoints'''
+
+    os.makedirs(checkpoint_dir, exist_ok = True)
+    shards = get_shards(upper_bound, workers * shards_per_worker)
+    results = [None] * len(shards)
+    start_time = perf_counter()
+
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(search_shard, i, low, high, checkpoint_dir) for i, (low, high) in enumerate(shards)]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.index] = result
+            (low, high) = shards[result.index]
+
+            if result.worker is None:
+                print(f"Shard {result.index:>3} | {low:,} - {high:,} | Already done")
+            else:
+                print(f"Shard {result.index:>3} | {low:,} - {high:,} | Worker {result.worker} | {result.candidates:,} candidates | {result.candidates / result.seconds:,.0f} candidates/s")
+
+    #Shards are merged in order, so the caboose numbers come out sorted
+    caboose_nums = [2] + [n for result in results for n in result.checkpoint["caboose"]]
+
+    print(f"\nCaboose numbers: {caboose_nums}")
+    print(f"Time taken: {perf_counter() - start_time:.2f}s")
+
+    worker_stats = {}
+    for result in results:
+        if result.worker is not None:
+            (candidates, seconds) = worker_stats.get(result.worker, (0, 0.0))
+            worker_stats[result.worker] = (candidates + result.candidates, seconds + result.seconds)
+
+    for worker, (candidates, seconds) in sorted(worker_stats.items()):
+        print(f"Worker {worker} | {candidates:,} candidates | {candidates / seconds:,.0f} candidates/s")
+
+    return caboose_nums
+
+if __name__ == "__main__":
+    run_search(UPPER_BOUND)